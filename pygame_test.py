@@ -1,30 +1,306 @@
-print("--- RUNNING PYGAME VERSION ---")
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
 import pygame
 
-# Initialize Pygame
-pygame.init()
+from rpg_terminal import (
+    CLASSES, ENEMIES, MAP_HEIGHT, MAP_WIDTH, MAX_ROOMS, PROMPT_KEYS, UI, VIEW_HEIGHT, VIEW_WIDTH,
+    Game
+)
+
+# --- Window Constants ---
+TILE_PX = 24
+FPS = 60
+FONT_PX = 18
+PANEL_LINES = 16  # header, party, messages and the current menu
+BACKGROUND = (16, 16, 24)
+TEXT_COLOR = (220, 220, 220)
+EMOJI_FONTS = "notocoloremoji,applecoloremoji,segoeuiemoji,symbola"
+EMOJI_FONT_PX = 109  # the only size bitmap colour emoji fonts render at
+
+# Without an emoji font each icon becomes a letter on a coloured tile
+FALLBACK_TILES = {
+    "wall": ("", (90, 70, 60)), "floor": ("", (34, 34, 40)), "stairs": (">", (60, 60, 150)),
+    "warrior": ("W", (40, 90, 160)), "mage": ("M", (110, 60, 160)), "archer": ("A", (40, 130, 80)),
+    "goblin": ("g", (120, 140, 40)), "orc": ("o", (150, 90, 40)), "troll": ("T", (130, 60, 60)),
+    "dragon": ("D", (180, 30, 30)), "potion": ("!", (170, 40, 90)), "weapon": ("/", (130, 130, 130)),
+    "armor": ("[", (100, 110, 130)),
+}
+# Classes and enemies come from the content packs, so their icons are looked
+# up on the loaded entries rather than in the "ui" table
+NAMED_ICONS = {
+    **{name: UI[name] for name in FALLBACK_TILES if name in UI},
+    **{name: entry["icon"] for name, entry in {**ENEMIES, **CLASSES}.items()},
+}
+# Status lines are drawn with a plain font, so their emoji become labels
+TEXT_LABELS = {
+    UI["hp"]: "HP", UI["xp"]: "XP", UI["mana"]: "MP", UI["attack"]: "ATK", UI["defense"]: "DEF",
+    UI["level"]: "Lv", UI["weapon"]: "Wpn", UI["armor"]: "Arm",
+    **{entry["icon"]: "" for entry in CLASSES.values()},
+}
+ARROW_KEYS = {pygame.K_UP: "w", pygame.K_DOWN: "s", pygame.K_LEFT: "a", pygame.K_RIGHT: "d"}
+
+def plain_text(text):
+    for icon, label in TEXT_LABELS.items():
+        text = text.replace(icon, label)
+    return text.replace("️", "").strip("\n")
+
+# --- Atlas ---
+class TileAtlas:
+    # Every icon is rendered once into a single surface; drawing a tile is
+    # then a blit of one cell of it.
+    def __init__(self, tile_px=TILE_PX):
+        self.tile_px = tile_px
+        self.cells = {}
+        self.surface = pygame.Surface((tile_px * len(NAMED_ICONS), tile_px))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # raised when fc-list is missing
+            path = pygame.font.match_font(EMOJI_FONTS)
+        self.emoji_font = pygame.font.Font(path, EMOJI_FONT_PX) if path else None
+        self.letter_font = pygame.font.Font(None, tile_px)
+        for name, icon in NAMED_ICONS.items():
+            if icon not in self.cells:
+                self.add(icon, name)
+
+    def add(self, icon, name=None):
+        index = len(self.cells)
+        if (index + 1) * self.tile_px > self.surface.get_width():
+            grown = pygame.Surface((self.surface.get_width() * 2, self.tile_px))
+            grown.blit(self.surface, (0, 0))
+            self.surface = grown
+        cell = pygame.Rect(index * self.tile_px, 0, self.tile_px, self.tile_px)
+        letter, color = FALLBACK_TILES.get(name, ("?", (80, 80, 80)))
+        self.surface.fill(color, cell)
+        if self.emoji_font is not None:
+            glyph = self.emoji_font.render(icon, True, TEXT_COLOR)
+            glyph = pygame.transform.smoothscale(glyph, (self.tile_px, self.tile_px))
+            self.surface.fill(FALLBACK_TILES["floor"][1], cell)
+            self.surface.blit(glyph, cell)
+        elif letter:
+            glyph = self.letter_font.render(letter, True, TEXT_COLOR)
+            self.surface.blit(glyph, glyph.get_rect(center=cell.center))
+        self.cells[icon] = cell
+        return cell
+
+    def cell(self, icon):
+        return self.cells.get(icon) or self.add(icon)
+
+# --- Rendering ---
+class PygameRenderer:
+    # Stands in for TerminalRenderer: the game calls draw() and echo() as
+    # usual, and present() puts the latest frame on screen, blitting only the
+    # map cells that changed and returning them as dirty rectangles.
+    def __init__(self, screen, atlas, font):
+        self.screen = screen
+        self.atlas = atlas
+        self.font = font
+        self.map_top = 0
+        self.panel_top = VIEW_HEIGHT * atlas.tile_px
+        self.last_rows = None
+        self.last_text = None
+        self.pending = None
+        self.text = []
+        self.notes = []
+
+    def clear(self):
+        self.invalidate()
+
+    def invalidate(self):
+        self.last_rows = None
+        self.last_text = None
+
+    def echo(self, text):
+        self.notes.append(text)
+
+    def draw(self, lines):
+        self.pending, self.notes = lines, []
+
+    def dirty(self):
+        return self.pending is not None or bool(self.notes)
+
+    def present(self, prompt_text=""):
+        rects = []
+        if self.pending is not None:
+            rows = [line for line in self.pending if not isinstance(line, str)]
+            self.text = [line for line in self.pending if isinstance(line, str)]
+            rects.extend(self.draw_map(rows))
+            self.pending = None
+        text = [plain_text(line) for line in self.text + "".join(self.notes).split("\n")]
+        text.append(plain_text(prompt_text))
+        if text != self.last_text:
+            rects.append(self.draw_panel(text))
+            self.last_text = text
+        return rects
+
+    def draw_map(self, rows):
+        px, atlas, screen, last = self.atlas.tile_px, self.atlas, self.screen, self.last_rows
+        rects = []
+        for y, row in enumerate(rows):
+            old = last[y] if last is not None and y < len(last) and len(last[y]) == len(row) else None
+            for x, icon in enumerate(row):
+                if old is None or old[x] != icon:
+                    dest = (x * px, self.map_top + y * px)
+                    screen.blit(atlas.surface, dest, atlas.cell(icon))
+                    rects.append(pygame.Rect(dest, (px, px)))
+        self.last_rows = rows
+        # Scrolling changes most cells; past a tenth of the view one big
+        # rectangle is cheaper than hundreds of small ones
+        width = max((len(row) for row in rows), default=0) * px
+        if len(rects) * 10 > len(rows) * len(rows[0] if rows else ()):
+            return [pygame.Rect(0, self.map_top, width, len(rows) * px)]
+        return rects
+
+    def draw_panel(self, text):
+        line_px = self.font.get_linesize()
+        panel = pygame.Rect(0, self.panel_top, self.screen.get_width(), self.screen.get_height() - self.panel_top)
+        self.screen.fill(BACKGROUND, panel)
+        # Keep the newest lines, the prompt and menu matter most
+        visible = [line for line in text if line][-(panel.height // line_px):]
+        for i, line in enumerate(visible):
+            self.screen.blit(self.font.render(line, True, TEXT_COLOR), (4, panel.top + i * line_px))
+        return panel
+
+# --- Front End ---
+def open_window(headless=False):
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    font = pygame.font.Font(None, FONT_PX)
+    size = (VIEW_WIDTH * TILE_PX, VIEW_HEIGHT * TILE_PX + PANEL_LINES * font.get_linesize())
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption("Emoji Dungeon")
+    return screen, PygameRenderer(screen, TileAtlas(), font)
+
+def setup_answer(game, prompt, party):
+    if prompt.kind == "party_size":
+        return str(len(party))
+    if prompt.kind == "hero_name":
+        return f"Hero {len(game.players) + 1}"
+    return party[len(game.players)]
+
+def key_answer(event):
+    if event.key in ARROW_KEYS:
+        return ARROW_KEYS[event.key]
+    if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+        return "\n"
+    if event.key == pygame.K_BACKSPACE:
+        return "\b"
+    return event.unicode.lower()
+
+def play(game, renderer, party, fps=FPS, policy=None, max_frames=None):
+    # One loop for people and benchmarks: a person's keys or a policy's
+    # answers are fed to play(), and the screen is updated once per frame.
+    clock = pygame.time.Clock()
+    session = game.play()
+    stats = {"frames": 0, "frame_ms": [], "render_ms": [], "dirty_rects": 0, "answers": 0}
+    line = None  # digits typed so far, for menus with ten or more entries
+    try:
+        prompt = next(session)
+        while prompt.player is None:
+            prompt = session.send(setup_answer(game, prompt, party))
+        pygame.display.flip()
+        while max_frames is None or stats["frames"] < max_frames:
+            start = time.perf_counter()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return stats
+                if event.type != pygame.KEYDOWN or policy is not None:
+                    continue
+                key = key_answer(event)
+                if line is not None:
+                    if key == "\n":
+                        prompt, line = session.send(line), None
+                    else:
+                        line = line[:-1] if key == "\b" else line + key
+                elif not key or key in "\n\b" or key not in PROMPT_KEYS.get(prompt.kind, key):
+                    continue
+                elif prompt.options and len(prompt.options) > 9 and prompt.kind != "combat":
+                    line = key
+                else:
+                    prompt = session.send(key)
+                stats["answers"] += 1
+            if policy is not None:
+                prompt = session.send(policy.decide(game, prompt))
+                stats["answers"] += 1
+            drawn = time.perf_counter()
+            rects = renderer.present(prompt.text + (line or ""))
+            if rects:
+                pygame.display.update(rects)
+            end = time.perf_counter()
+            stats["frames"] += 1
+            stats["dirty_rects"] += len(rects)
+            stats["frame_ms"].append((end - start) * 1000)
+            stats["render_ms"].append((end - drawn) * 1000)
+            clock.tick(fps)
+    except StopIteration:
+        renderer.present()
+        pygame.display.flip()
+    finally:
+        game.stop_pregeneration()
+    return stats
 
-# Set screen dimensions
-screen_width = 800
-screen_height = 600
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Pygame Test")
+def benchmark(width, height, rooms, frames, seed, fps=0):
+    # Headless run driven by the greedy policy, one decision per frame
+    from rpg_sim import GreedyPolicy
 
-print("Pygame window should be open. Close the window to exit.")
+    screen, renderer = open_window(headless=True)
+    game = Game(seed=seed, width=width, height=height, max_rooms=rooms, pregenerate=False)
+    game.renderer = renderer
+    game.highscore_db = os.path.join(tempfile.mkdtemp(), "scores.db")
+    party = ["warrior", "mage", "archer"]
+    stats = play(game, renderer, party, fps, GreedyPolicy(party, random.Random(seed)), frames)
+    pygame.quit()
+    count = stats["frames"]
+    percentile = lambda times, q: round(sorted(times)[min(count - 1, int(count * q))], 3) if count else None
+    # Frame time includes the policy and the game's own turn; render time is
+    # just the front end drawing the result
+    return {
+        "map": f"{width}x{height}",
+        "frames": count,
+        "frame_ms_p50": percentile(stats["frame_ms"], 0.5),
+        "frame_ms_p99": percentile(stats["frame_ms"], 0.99),
+        "render_ms_p50": percentile(stats["render_ms"], 0.5),
+        "render_ms_p99": percentile(stats["render_ms"], 0.99),
+        "render_fps_capacity": round(1000 * count / sum(stats["render_ms"]), 1) if count else None,
+        "dirty_rects_per_frame": round(stats["dirty_rects"] / count, 1) if count else None,
+    }
 
-# Game loop
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+def main():
+    parser = argparse.ArgumentParser(description="Graphical front end for the emoji dungeon crawler.")
+    parser.add_argument("--party", default="warrior,mage,archer", help="comma separated classes")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--width", type=int, default=MAP_WIDTH)
+    parser.add_argument("--height", type=int, default=MAP_HEIGHT)
+    parser.add_argument("--rooms", type=int, default=MAX_ROOMS)
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument("--benchmark", type=int, metavar="FRAMES",
+                        help="play this many frames headless with the greedy policy and print timings")
+    args = parser.parse_args()
+    party = args.party.split(",")
+    if not 1 <= len(party) <= 3 or any(c not in CLASSES for c in party):
+        parser.error("--party takes 1-3 of: " + ", ".join(CLASSES))
 
-    # Fill the background with white
-    screen.fill((255, 255, 255))
+    if args.benchmark:
+        # Uncapped, so the timings show the real headroom under 60 FPS
+        print(json.dumps(benchmark(args.width, args.height, args.rooms, args.benchmark, args.seed or 0),
+                         indent=4))
+        return
 
-    # Update the display
-    pygame.display.flip()
+    print("--- RUNNING PYGAME VERSION ---")
+    screen, renderer = open_window()
+    pygame.key.set_repeat(200, 50)  # holding a key keeps the party walking
+    game = Game(seed=args.seed, width=args.width, height=args.height, max_rooms=args.rooms)
+    game.renderer = renderer
+    play(game, renderer, party, args.fps)
+    pygame.quit()
+    print("Pygame window closed.")
 
-# Quit Pygame
-pygame.quit()
-print("Pygame window closed.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from rpg_terminal import CLASSES, ENEMIES, MAP_WIDTH, MAP_HEIGHT, SPAWNABLE_ENEMIES, Dungeon, Enemy, Game, Player
+from rpg_sim import GreedyPolicy, MAX_TURNS, play_run
+
+# --- Balance Constants ---
+# Chunks have a fixed size so results do not depend on the number of workers
+ENCOUNTERS_PER_CHUNK = 2000
+RUNS_PER_CHUNK = 25
+DEFAULT_PARTY = ["warrior", "mage", "archer"]
+
+def chunk_seed(master_seed, chunk):
+    # String seeds are hashed with SHA-512, giving each chunk its own stream
+    return random.Random(f"{master_seed}:{chunk}").getrandbits(64)
+
+# --- Encounters ---
+def setup_encounter(party, enemy_types, hero_level=1, seed=None):
+    game = Game(headless=True, seed=seed, enemy_ai=False)
+    game.dungeon = Dungeon(MAP_WIDTH, MAP_HEIGHT, 1)
+    for i, char_class in enumerate(party):
+        player = Player(1, 1, f"Hero {i+1}", char_class)
+        for _ in range(hero_level - 1):
+            player.level_up()
+        game.players.append(player)
+    enemies = [Enemy(2, 1, enemy_type) for enemy_type in enemy_types]
+    for enemy in enemies:
+        game.dungeon.add_enemy(enemy)
+    return game, enemies
+
+def play_encounter(party, enemy_types, policy, hero_level=1, damage_log=None, seed=None):
+    game, enemies = setup_encounter(party, enemy_types, hero_level, seed)
+    game.damage_log = damage_log
+    game.run(policy, game.start_combat(enemies))
+    return any(p.is_alive() for p in game.players)
+
+def random_enemy_group(rng):
+    return [rng.choice(SPAWNABLE_ENEMIES) for _ in range(rng.randint(1, 3))]
+
+def new_totals():
+    return {
+        "encounters": Counter(),
+        "wins": Counter(),
+        "hero_damage": Counter(),
+        "enemy_damage": Counter(),
+        "runs": 0,
+        "run_wins": 0,
+        "depth": Counter(),
+        "causes_of_death": Counter(),
+    }
+
+def run_chunk(task):
+    kind, count, seed, options = task
+    # Every game in the chunk is seeded from the chunk's own stream, so results
+    # only depend on the master seed and the chunk number.
+    rng = random.Random(seed)
+    totals = new_totals()
+    party = options["party"]
+    if kind == "encounter":
+        damage_log = []
+        for _ in range(count):
+            enemy_types = options["enemies"] or random_enemy_group(rng)
+            won = play_encounter(party, enemy_types, GreedyPolicy(party, rng), options["hero_level"],
+                                 damage_log, rng.getrandbits(64))
+            group = "+".join(sorted(enemy_types))
+            totals["encounters"][group] += 1
+            totals["wins"][group] += won
+            for attacker, _, damage in damage_log:
+                side = "hero_damage" if isinstance(attacker, Player) else "enemy_damage"
+                totals[side][damage] += 1
+            damage_log.clear()
+    else:
+        for _ in range(count):
+            result = play_run(GreedyPolicy(party, rng), rng.getrandbits(64), options["max_turns"],
+                              enemy_ai=options["enemy_ai"])
+            totals["runs"] += 1
+            totals["run_wins"] += result["won"]
+            totals["depth"][result["depth"]] += 1
+            totals["causes_of_death"][result["cause_of_death"] or "victory"] += 1
+    return totals
+
+def merge(totals, other):
+    for key, value in other.items():
+        totals[key] += value
+    return totals
+
+def plan(kind, count, chunk_size, seed, options, offset=0):
+    return [(kind, min(chunk_size, count - start), chunk_seed(seed, offset + i), options)
+            for i, start in enumerate(range(0, count, chunk_size))]
+
+def run_batch(encounters=0, runs=0, seed=0, workers=None, party=None, enemies=None,
+              hero_level=1, max_turns=MAX_TURNS, enemy_ai=False):
+    workers = workers or os.cpu_count() or 1
+    options = {"party": party or DEFAULT_PARTY, "enemies": enemies, "hero_level": hero_level,
+               "max_turns": max_turns, "enemy_ai": enemy_ai}
+    tasks = plan("encounter", encounters, ENCOUNTERS_PER_CHUNK, seed, options)
+    tasks += plan("run", runs, RUNS_PER_CHUNK, seed, options, offset=len(tasks))
+    totals = new_totals()
+    if workers == 1:
+        for task in tasks:
+            merge(totals, run_chunk(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_totals in pool.map(run_chunk, tasks):
+                merge(totals, chunk_totals)
+    return totals
+
+def report(totals):
+    win_rates = {group: round(totals["wins"][group] / n, 4) for group, n in sorted(totals["encounters"].items())}
+    encounters = sum(totals["encounters"].values())
+    return {
+        "encounters": encounters,
+        "encounter_win_rate": round(sum(totals["wins"].values()) / encounters, 4) if encounters else None,
+        "win_rate_by_group": win_rates,
+        "hero_damage_histogram": dict(sorted(totals["hero_damage"].items())),
+        "enemy_damage_histogram": dict(sorted(totals["enemy_damage"].items())),
+        "runs": totals["runs"],
+        "run_win_rate": round(totals["run_wins"] / totals["runs"], 4) if totals["runs"] else None,
+        "depth_reached": dict(sorted(totals["depth"].items())),
+        "causes_of_death": dict(totals["causes_of_death"].most_common()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo balance runs spread across CPU cores.")
+    parser.add_argument("--encounters", type=int, default=10000, help="number of simulated combats")
+    parser.add_argument("--runs", type=int, default=0, help="number of full dungeon runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--party", help="comma separated classes, e.g. warrior,mage,archer")
+    parser.add_argument("--enemies", help="fixed enemy group, e.g. orc,orc,troll (random if omitted)")
+    parser.add_argument("--hero-level", type=int, default=1)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--enemy-ai", action="store_true", help="let enemies chase the party in full runs")
+    args = parser.parse_args()
+
+    party = args.party.split(",") if args.party else None
+    if party and (not 1 <= len(party) <= 3 or any(c not in CLASSES for c in party)):
+        parser.error("--party takes 1-3 of: " + ", ".join(CLASSES))
+    enemies = args.enemies.split(",") if args.enemies else None
+    if enemies and any(e not in ENEMIES for e in enemies):
+        parser.error("--enemies takes any of: " + ", ".join(ENEMIES))
+
+    start = time.perf_counter()
+    totals = run_batch(args.encounters, args.runs, args.seed, args.workers, party, enemies,
+                       args.hero_level, args.max_turns, args.enemy_ai)
+    summary = report(totals)
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(summary, indent=4))
+
+if __name__ == "__main__":
+    main()
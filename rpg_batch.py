@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from rpg_terminal import CLASS_NAMES, CLASSES, ENEMIES, SPAWNABLE_ENEMIES, Enemy, Player
+
+# --- Batch Combat Constants ---
+CLASS_CODES = {name: code for code, name in enumerate(CLASS_NAMES)}
+NO_CLASS = -1  # enemy slots
+NO_SKILL = -2  # matches no slot, for a skill class the content leaves out
+WARRIOR, MAGE, ARCHER = (CLASS_CODES.get(name, NO_SKILL) for name in ("warrior", "mage", "archer"))
+ATTACK, SKILL = 1, 2
+FIREBALL_COST = 10
+POWER_STRIKE_COOLDOWN = 3
+DOUBLE_SHOT_COOLDOWN = 2
+MAX_ROUNDS = 1000
+
+# --- Random Draws ---
+# Every targeted action consumes one uniform draw from its encounter's stream
+# and picks the floor(u * n)-th living target, in the same order as the
+# scalar code's random.choice calls. Streams are either generated on demand
+# or supplied up front to replay the choices of a scalar combat.
+class DrawStream:
+    def __init__(self, encounters, rng=None, draws=None):
+        self.rng = rng
+        self.draws = None if draws is None else np.asarray(draws, dtype=float)
+        self.cursor = np.zeros(encounters, dtype=np.int64)
+
+    def take(self, mask, rows):
+        if self.draws is None:
+            return self.rng.random(len(rows))
+        cursor = self.cursor[rows]
+        if cursor[mask].max(initial=-1) >= self.draws.shape[1]:
+            raise IndexError("draw stream exhausted")
+        u = self.draws[rows, np.minimum(cursor, self.draws.shape[1] - 1)]
+        self.cursor[rows] = cursor + mask
+        return u
+
+def pick(candidates, u):
+    # Index of the k-th True slot per row, with k = floor(u * count)
+    cum = np.cumsum(candidates, axis=1)
+    k = np.floor(u * cum[:, -1]).astype(np.int64)
+    return np.argmax(cum > k[:, None], axis=1)
+
+# --- Batch Combat ---
+# Many independent encounters resolved together. Slot layout per encounter is
+# players first, then enemies, matching `self.players + enemies` in
+# Game.start_combat; unused slots are dead padding. Class auras are not
+# modelled, so a party with one is refused rather than resolved wrongly.
+class BatchCombat:
+    def __init__(self, encounters):
+        for players, _ in encounters:
+            for player in players:
+                if CLASSES[player.char_class].get("aura"):
+                    raise ValueError(f"the {player.char_class} aura is not supported by the batch resolver")
+        count = len(encounters)
+        slots = max(len(players) + len(enemies) for players, enemies in encounters)
+        self.hp = np.zeros((count, slots), dtype=np.int64)
+        self.attack = np.zeros((count, slots), dtype=np.int64)
+        self.defense = np.zeros((count, slots), dtype=np.int64)
+        self.is_player = np.zeros((count, slots), dtype=bool)
+        self.char_class = np.full((count, slots), NO_CLASS, dtype=np.int16)
+        self.mana = np.zeros((count, slots), dtype=np.int64)
+        self.cooldown = np.zeros((count, slots), dtype=np.int64)
+        self.sizes = np.zeros(count, dtype=np.int64)
+        for row, (players, enemies) in enumerate(encounters):
+            for slot, entity in enumerate(list(players) + list(enemies)):
+                self.hp[row, slot] = entity.hp
+                self.attack[row, slot] = entity.attack
+                self.defense[row, slot] = entity.defense
+                if isinstance(entity, Player):
+                    self.is_player[row, slot] = True
+                    self.char_class[row, slot] = CLASS_CODES[entity.char_class]
+                    self.mana[row, slot] = entity.mana
+                    self.cooldown[row, slot] = entity.skill_cooldown
+            self.sizes[row] = len(players) + len(enemies)
+        self.rounds = np.zeros(count, dtype=np.int64)
+        self.hero_hits = []
+        self.enemy_hits = []
+
+    @classmethod
+    def from_tables(cls, parties, enemy_groups):
+        # Build each distinct party/enemy line-up once and gather the rows
+        lineups = {}
+        rows = [lineups.setdefault((tuple(party), tuple(group)), len(lineups))
+                for party, group in zip(parties, enemy_groups)]
+        templates = cls([([Player(0, 0, f"Hero {i+1}", c) for i, c in enumerate(party)],
+                          [Enemy(0, 0, e) for e in group])
+                         for party, group in lineups])
+        return templates.take(np.array(rows, dtype=np.int64))
+
+    def take(self, rows):
+        batch = object.__new__(type(self))
+        for name, value in vars(self).items():
+            setattr(batch, name, value[rows] if isinstance(value, np.ndarray) else [])
+        return batch
+
+    def random_order(self, rng):
+        # Padding sorts last; a uniform permutation of the live slots otherwise
+        keys = rng.random(self.hp.shape)
+        keys[np.arange(self.hp.shape[1])[None, :] >= self.sizes[:, None]] = 2.0
+        return np.argsort(keys, axis=1)
+
+    def alive_players(self):
+        return self.is_player & (self.hp > 0)
+
+    def alive_enemies(self):
+        return ~self.is_player & (self.hp > 0)
+
+    def finished(self):
+        return ~self.alive_players().any(axis=1) | ~self.alive_enemies().any(axis=1)
+
+    def wins(self):
+        return self.alive_players().any(axis=1)
+
+    def hit(self, mask, target, damage, log):
+        rows = np.nonzero(mask)[0]
+        if not len(rows):
+            return
+        self.hp[rows, target[rows]] = np.maximum(0, self.hp[rows, target[rows]] - damage[rows])
+        log.append(damage[rows])
+
+    def skill_ready(self, rows, actor):
+        cls = self.char_class[rows, actor]
+        ready = self.cooldown[rows, actor] == 0
+        return np.where(cls == MAGE, self.mana[rows, actor] >= FIREBALL_COST, ready)
+
+    def resolve(self, order=None, draws=None, use_skills=True, rng=None, max_rounds=MAX_ROUNDS):
+        # Mirrors Game.start_combat with GreedyPolicy's choice of action:
+        # use the class skill when it is ready, otherwise attack. Each round
+        # only gathers the encounters that are still being fought.
+        rng = rng or np.random.default_rng()
+        order = self.random_order(rng) if order is None else order
+        draws = draws or DrawStream(len(self.hp), rng)
+        active = np.nonzero(~self.finished())[0]
+        for _ in range(max_rounds):
+            if not len(active):
+                break
+            live = self.take(active)
+            live.play_round(order[active], draws, active, use_skills)
+            self.hp[active] = live.hp
+            self.mana[active] = live.mana
+            self.cooldown[active] = live.cooldown
+            self.rounds[active] += 1
+            self.hero_hits += live.hero_hits
+            self.enemy_hits += live.enemy_hits
+            active = active[~live.finished()]
+        return self.wins()
+
+    def play_round(self, order, draws, ids, use_skills):
+        count, slots = self.hp.shape
+        rows = np.arange(count)
+        done = self.finished()
+        for turn in range(slots):
+            actor = order[:, turn]
+            acting = ~done & (self.hp[rows, actor] > 0)
+            if not acting.any():
+                continue
+            attack = self.attack[rows, actor]
+            hero = acting & self.is_player[rows, actor]
+            cls = self.char_class[rows, actor]
+            skill = hero & self.skill_ready(rows, actor) if use_skills else np.zeros(count, dtype=bool)
+            strike = skill & (cls == WARRIOR)
+            fireball = skill & (cls == MAGE)
+            double_shot = skill & (cls == ARCHER)
+            hero_attack = hero & ~skill
+            enemy_attack = acting & ~self.is_player[rows, actor]
+
+            u = draws.take(hero_attack | strike | double_shot | enemy_attack, ids)
+            enemy_target = pick(self.alive_enemies(), u)
+            player_target = pick(self.alive_players(), u)
+            self.hit(hero_attack, enemy_target,
+                     np.maximum(0, attack - self.defense[rows, enemy_target]), self.hero_hits)
+            self.hit(strike, enemy_target, attack * 2, self.hero_hits)
+            self.hit(double_shot, enemy_target, attack, self.hero_hits)
+            self.hit(enemy_attack, player_target,
+                     np.maximum(0, attack - self.defense[rows, player_target]), self.enemy_hits)
+
+            if fireball.any():
+                burned = self.alive_enemies() & fireball[:, None]
+                damage = np.broadcast_to((attack // 2)[:, None], burned.shape)
+                self.hp = np.where(burned, np.maximum(0, self.hp - damage), self.hp)
+                self.hero_hits.append(damage[burned])
+                self.mana[rows[fireball], actor[fireball]] -= FIREBALL_COST
+
+            second = double_shot & self.alive_enemies().any(axis=1)
+            if second.any():
+                u = draws.take(second, ids)
+                self.hit(second, pick(self.alive_enemies(), u), attack, self.hero_hits)
+
+            self.cooldown[rows[strike], actor[strike]] = POWER_STRIKE_COOLDOWN
+            self.cooldown[rows[double_shot], actor[double_shot]] = DOUBLE_SHOT_COOLDOWN
+            done = self.finished()
+
+    def damage_histograms(self):
+        hero = np.concatenate(self.hero_hits) if self.hero_hits else np.zeros(0, dtype=np.int64)
+        enemy = np.concatenate(self.enemy_hits) if self.enemy_hits else np.zeros(0, dtype=np.int64)
+        return np.bincount(hero), np.bincount(enemy)
+
+# --- Scalar Equivalence Check ---
+class RecordingRandom(random.Random):
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.choices = []
+        self.orders = []
+
+    def choice(self, seq):
+        index = self._randbelow(len(seq))
+        self.choices.append((index + 0.5) / len(seq))
+        return seq[index]
+
+    def shuffle(self, x):
+        before = list(x)
+        super().shuffle(x)
+        self.orders.append([next(i for i, o in enumerate(before) if o is entity) for entity in x])
+
+def verify(encounters=2000, seed=0):
+    from rpg_balance import random_enemy_group, setup_encounter
+    from rpg_sim import GreedyPolicy
+
+    rng = random.Random(seed)
+    classes = [name for name in CLASS_NAMES if not CLASSES[name].get("aura")]
+    setups, scalar_results, orders, draws = [], [], [], []
+    for _ in range(encounters):
+        party = [rng.choice(classes) for _ in range(rng.randint(1, 3))]
+        group = random_enemy_group(rng)
+        hero_level = rng.randint(1, 3)
+        game, enemies = setup_encounter(party, group, hero_level)
+        recorder = game.rng = RecordingRandom(rng.getrandbits(64))
+        combatants = game.players + enemies
+        start_hp = [e.hp for e in combatants]
+        game.damage_log = []
+        game.run(GreedyPolicy(party), game.start_combat(enemies))
+        # Rebuild HP from the damage log, since a won fight hands out XP
+        # and a level-up refills the heroes' HP afterwards.
+        taken = [0] * len(combatants)
+        for _, target, damage in game.damage_log:
+            taken[next(i for i, e in enumerate(combatants) if e is target)] += damage
+        setups.append((party, group, hero_level))
+        scalar_results.append([max(0, hp - t) for hp, t in zip(start_hp, taken)])
+        orders.append(recorder.orders[0])
+        draws.append(recorder.choices)
+
+    fresh = []
+    for party, group, hero_level in setups:
+        players = [Player(0, 0, f"Hero {i+1}", c) for i, c in enumerate(party)]
+        for player in players:
+            for _ in range(hero_level - 1):
+                player.level_up()
+        fresh.append((players, [Enemy(0, 0, e) for e in group]))
+    batch = BatchCombat(fresh)
+    slots = batch.hp.shape[1]
+    order = np.array([o + list(range(len(o), slots)) for o in orders])
+    width = max(len(d) for d in draws)
+    draw_table = np.array([d + [0.5] * (width - len(d)) for d in draws])
+    batch.resolve(order, DrawStream(encounters, draws=draw_table))
+
+    mismatches = 0
+    for row, expected in enumerate(scalar_results):
+        got = batch.hp[row, :len(expected)].tolist()
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"encounter {row} {setups[row]}: scalar {expected} batch {got}")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized batch combat resolver.")
+    parser.add_argument("--verify", type=int, metavar="N", help="check N encounters against Game.start_combat")
+    parser.add_argument("--encounters", type=int, default=100000)
+    parser.add_argument("--party", default="warrior,mage,archer")
+    parser.add_argument("--enemies", help="fixed enemy group, e.g. orc,orc,troll (random if omitted)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.verify:
+        mismatches = verify(args.verify, args.seed)
+        print(f"{args.verify - mismatches}/{args.verify} encounters match the scalar rules")
+        sys.exit(1 if mismatches else 0)
+
+    party = args.party.split(",")
+    if not 1 <= len(party) <= 3 or any(c not in CLASSES for c in party):
+        parser.error("--party takes 1-3 of: " + ", ".join(CLASSES))
+    enemies = args.enemies.split(",") if args.enemies else None
+    if enemies and any(e not in ENEMIES for e in enemies):
+        parser.error("--enemies takes any of: " + ", ".join(ENEMIES))
+
+    rng = np.random.default_rng(args.seed)
+    pool = SPAWNABLE_ENEMIES
+    if enemies:
+        groups = [enemies] * args.encounters
+    else:
+        groups = [[pool[k] for k in rng.integers(0, len(pool), rng.integers(1, 4))] for _ in range(args.encounters)]
+    start = time.perf_counter()
+    try:
+        batch = BatchCombat.from_tables([party] * args.encounters, groups)
+    except ValueError as e:
+        parser.error(str(e))
+    wins = batch.resolve(rng=rng)
+    elapsed = time.perf_counter() - start
+    print(f"{args.encounters} encounters in {elapsed:.3f}s, win rate {wins.mean():.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+from rpg_balance import setup_encounter
+from rpg_sim import GreedyPolicy, TurnLimit
+from rpg_terminal import (
+    CLASS_NAMES, TILE_FLOOR, DistanceMap, Dungeon, Enemy, Game, HighscoreStore, Player, SaveFile,
+    SPAWNABLE_ENEMIES, TerminalRenderer, load_game
+)
+
+# --- Benchmark Constants ---
+ARENA_SIZE = 120
+ENEMY_COUNTS = [10, 100, 1000, 5000]
+NAIVE_LIMIT = 100  # per-enemy search gets too slow to bother past this
+ROUNDS = 20
+SAVE_MAP_SIZE = 400
+SAVE_TURNS = 300
+HIGHSCORE_ROWS = 1000000
+REPEATS = 5  # each timing is the best of this many runs, the least disturbed by noise
+MAP_SIZES = [(40, 20), (200, 200), (1000, 1000)]
+ROOM_COUNTS = [15, 150, 1500]
+PARTY_SIZES = [1, 2, 3]
+COMBAT_ENEMIES = [1, 10, 100, 1000]
+COMBAT_HERO_LEVEL = 3  # so larger fights last more than a few rounds
+MOVES = 2000
+FRAMES = 500
+MOVE_KEYS = {"w": (0, -1), "s": (0, 1), "a": (-1, 0), "d": (1, 0)}
+# Results are matched between runs on these fields; the rest are measurements
+PARAMS = ("map", "rooms", "party", "enemies", "rows")
+METRIC_SUFFIXES = ("_ms", "_us", "_s")
+TOLERANCE = 0.25  # slowdown reported as a regression by --compare
+
+def best_time(func, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# --- Enemy AI ---
+def open_arena(size, seed):
+    # One big room walled in by the map border, so every enemy can reach the party
+    dungeon = Dungeon(size, size, 1, seed)
+    for y in range(1, size - 1):
+        dungeon.tiles[y * size + 1:(y + 1) * size - 1] = bytes([TILE_FLOOR]) * (size - 2)
+    return dungeon
+
+def chase_game(enemy_count, size=ARENA_SIZE, seed=0):
+    game = Game(headless=True, seed=seed)
+    game.chase_map = DistanceMap(radius=None)
+    game.dungeon = dungeon = open_arena(size, seed)
+    center = size // 2
+    for i, char_class in enumerate(["warrior", "mage", "archer"]):
+        player = Player(center + i, center, f"Hero {i+1}", char_class)
+        game.players.append(player)
+        dungeon.place_player(player, player.x, player.y)
+    rng = random.Random(seed)
+    free = [(x, y) for y in range(1, size - 1) for x in range(1, size - 1)
+            if abs(x - center) + abs(y - center) > 3]
+    for x, y in rng.sample(free, enemy_count):
+        dungeon.add_enemy(Enemy(x, y, rng.choice(SPAWNABLE_ENEMIES)))
+    return game
+
+def walk_party(game, step):
+    # The party paces back and forth so the shared field goes stale every round
+    dx = 1 if step % 8 < 4 else -1
+    for player in game.players:
+        game.dungeon.place_player(player, player.x + dx, player.y)
+
+def naive_step(game):
+    # The baseline: every enemy runs its own search towards the nearest hero
+    dungeon = game.dungeon
+    heroes = {(p.x, p.y) for p in game.players}
+    for enemy in list(dungeon.enemies):
+        start = (enemy.x, enemy.y)
+        parent = {start: None}
+        queue = deque([start])
+        goal = None
+        while queue and goal is None:
+            x, y = queue.popleft()
+            for nxt in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                if nxt in parent or dungeon.tile(*nxt) != TILE_FLOOR:
+                    continue
+                parent[nxt] = (x, y)
+                if nxt in heroes:
+                    goal = nxt
+                    break
+                queue.append(nxt)
+        if goal is None or parent[goal] == start:
+            continue
+        while parent[goal] != start:
+            goal = parent[goal]
+        if goal not in dungeon.enemy_index.cells:
+            dungeon.move_enemy(enemy, *goal)
+
+def time_rounds(game, step, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        walk_party(game, i)
+        step(game)
+    return (time.perf_counter() - start) / rounds
+
+def bench_enemy_ai(counts=ENEMY_COUNTS, rounds=ROUNDS, seed=0):
+    results = []
+    for count in counts:
+        game = chase_game(count, seed=seed)
+        shared = time_rounds(game, Game.move_enemies, rounds)
+        result = {"enemies": count, "shared_ms": round(shared * 1000, 3),
+                  "rebuilds": game.chase_map.rebuilds, "moves": game.dungeon.moves}
+        if count <= NAIVE_LIMIT:
+            naive = time_rounds(chase_game(count, seed=seed), naive_step, rounds)
+            result["naive_ms"] = round(naive * 1000, 3)
+        results.append(result)
+    return results
+
+# --- Saves ---
+class TimedSaveFile(SaveFile):
+    def __init__(self, path):
+        super().__init__(path)
+        self.times = []
+        self.sizes = []
+
+    def autosave(self, game):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        start = time.perf_counter()
+        super().autosave(game)
+        self.times.append(time.perf_counter() - start)
+        self.sizes.append(os.path.getsize(self.path) - size)
+
+def bench_saves(size=SAVE_MAP_SIZE, turns=SAVE_TURNS, seed=0):
+    # Autosave every turn of a greedy run on a large map, then load it back
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run.sav")
+        game = Game(headless=True, seed=seed, width=size, height=size, max_rooms=size * 5)
+        game.save_file = saver = TimedSaveFile(path)
+        game.run(TurnLimit(GreedyPolicy(rng=random.Random(seed)), turns))
+        deltas = sorted(saver.times[1:])
+        start = time.perf_counter()
+        load_game(path, headless=True)
+        load = time.perf_counter() - start
+        return {
+            "map": f"{size}x{size}",
+            "enemies": len(game.dungeon.enemies),
+            "snapshot_ms": round(saver.times[0] * 1000, 3),
+            "snapshot_bytes": saver.sizes[0],
+            "autosave_median_ms": round(deltas[len(deltas) // 2] * 1000, 3),
+            "autosave_mean_bytes": round(sum(saver.sizes[1:]) / len(deltas)),
+            "load_ms": round(load * 1000, 3),
+        }
+
+# --- Highscores ---
+def bench_highscores(rows=HIGHSCORE_ROWS, seed=0):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HighscoreStore(os.path.join(tmp, "scores.db"), legacy_file=None)
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        with store.transaction():
+            store.db.executemany("INSERT INTO runs (party, level, xp) VALUES (?, ?, ?)",
+                                 ((f"Party {rng.randrange(rows // 10 + 1)}", rng.randint(1, 5), rng.randrange(1000))
+                                  for _ in range(rows)))
+        fill = time.perf_counter() - start
+        start = time.perf_counter()
+        store.record("Bench", 5, 999)
+        record = time.perf_counter() - start
+        start = time.perf_counter()
+        store.top(10)
+        top = time.perf_counter() - start
+        start = time.perf_counter()
+        store.party_runs("Party 1")
+        party = time.perf_counter() - start
+        store.close()
+    return {
+        "rows": rows,
+        "fill_s": round(fill, 3),
+        "record_ms": round(record * 1000, 3),
+        "top10_ms": round(top * 1000, 3),
+        "party_ms": round(party * 1000, 3),
+    }
+
+# --- Generation ---
+def bench_generation(sizes=MAP_SIZES, rooms=ROOM_COUNTS, seed=0):
+    results = []
+    for width, height in sizes:
+        for max_rooms in rooms:
+            elapsed = best_time(lambda: Dungeon(width, height, 1, seed, max_rooms).generate())
+            d = Dungeon(width, height, 1, seed, max_rooms)
+            d.generate()
+            results.append({"map": f"{width}x{height}", "rooms": max_rooms, "placed_rooms": len(d.rooms),
+                            "spawned_enemies": len(d.enemies), "generate_ms": round(elapsed * 1000, 3)})
+    return results
+
+def level_game(width, height, rooms, party_size, seed):
+    game = Game(headless=True, seed=seed, width=width, height=height, max_rooms=rooms)
+    game.players = [Player(0, 0, f"Hero {i+1}", CLASS_NAMES[i % len(CLASS_NAMES)]) for i in range(party_size)]
+    game.new_level()
+    return game
+
+# --- Rendering ---
+class BufferRenderer(TerminalRenderer):
+    # Frames go to memory, and every frame fits whatever the real terminal is
+    def __init__(self):
+        super().__init__(io.StringIO())
+
+    def fits_terminal(self, height):
+        return True
+
+    def take(self):
+        size = self.stream.tell()
+        self.stream.seek(0)
+        self.stream.truncate()
+        return size
+
+def bench_render(sizes=MAP_SIZES, parties=PARTY_SIZES, frames=FRAMES, seed=0):
+    # Full frames redraw everything; step frames follow a hero pacing back
+    # and forth, which is what the diffing renderer sees in play
+    results = []
+    for width, height in sizes:
+        for party_size in parties:
+            game = level_game(width, height, ROOM_COUNTS[0], party_size, seed)
+            game.renderer = renderer = BufferRenderer()
+
+            def full():
+                for _ in range(frames):
+                    renderer.invalidate()
+                    game.print_game()
+
+            def step():
+                hero = game.players[0]
+                dx = 1 if game.dungeon.tile(hero.x + 1, hero.y) == TILE_FLOOR else -1
+                for i in range(frames):
+                    game.dungeon.place_player(hero, hero.x + (dx if i % 2 == 0 else -dx), hero.y)
+                    game.print_game()
+
+            full_ms = best_time(full) / frames * 1000
+            full_bytes = renderer.take() // (frames * REPEATS)
+            step_ms = best_time(step) / frames * 1000
+            step_bytes = renderer.take() // (frames * REPEATS)
+            results.append({"map": f"{width}x{height}", "party": party_size,
+                            "full_frame_ms": round(full_ms, 4), "full_frame_chars": full_bytes,
+                            "step_frame_ms": round(step_ms, 4), "step_frame_chars": step_bytes})
+    return results
+
+# --- Movement ---
+def bench_moves(sizes=MAP_SIZES, parties=PARTY_SIZES, moves=MOVES, seed=0):
+    # A random walk over floor tiles, never onto enemies or the stairs, so
+    # every move_player call is a plain step or an item pickup
+    results = []
+    for width, height in sizes:
+        for party_size in parties:
+            def walk():
+                game = level_game(width, height, ROOM_COUNTS[1], party_size, seed)
+                rng, d = random.Random(seed), game.dungeon
+                elapsed = 0
+                for i in range(moves):
+                    hero = game.players[i % party_size]
+                    keys = [key for key, (dx, dy) in MOVE_KEYS.items()
+                            if d.tile(hero.x + dx, hero.y + dy) == TILE_FLOOR
+                            and not d.enemies_at(hero.x + dx, hero.y + dy)]
+                    if keys:
+                        key = rng.choice(keys)
+                        start = time.perf_counter()
+                        for _ in game.move_player(hero, key):
+                            pass
+                        elapsed += time.perf_counter() - start
+                return elapsed
+
+            elapsed = min(walk() for _ in range(REPEATS))
+            results.append({"map": f"{width}x{height}", "party": party_size,
+                            "move_us": round(elapsed / moves * 1e6, 3)})
+    return results
+
+# --- Combat ---
+class AttackPolicy:
+    # Always attacks, so the timing covers the combat rules and nothing else
+    def decide(self, game, prompt):
+        return "1"
+
+def bench_combat(enemy_counts=COMBAT_ENEMIES, parties=PARTY_SIZES, seed=0):
+    results = []
+    for count in enemy_counts:
+        for party_size in parties:
+            party = [CLASS_NAMES[i % len(CLASS_NAMES)] for i in range(party_size)]
+            enemy_types = [SPAWNABLE_ENEMIES[i % len(SPAWNABLE_ENEMIES)] for i in range(count)]
+            actions = []
+
+            def fight():
+                game, enemies = setup_encounter(party, enemy_types, COMBAT_HERO_LEVEL, seed)
+                game.damage_log = log = []
+                game.run(AttackPolicy(), game.start_combat(enemies))
+                actions.append(len(log))
+
+            elapsed = best_time(fight)
+            results.append({"enemies": count, "party": party_size, "actions": actions[-1],
+                            "combat_ms": round(elapsed * 1000, 3),
+                            "action_us": round(elapsed / max(1, actions[-1]) * 1e6, 3)})
+    return results
+
+# --- Reports ---
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def flatten(results):
+    # {(benchmark, params): {metric: value}} for every row of every benchmark
+    rows = {}
+    for name, value in results.items():
+        for row in value if isinstance(value, list) else [value]:
+            params = tuple((key, row[key]) for key in PARAMS if key in row)
+            rows[(name, params)] = {key: row[key] for key in row if key.endswith(METRIC_SUFFIXES)}
+    return rows
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    old_rows = flatten(baseline)
+    for key, metrics in flatten(results).items():
+        for metric, new in metrics.items():
+            old = old_rows.get(key, {}).get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                name, params = key
+                label = " ".join(f"{k}={v}" for k, v in params)
+                regressions.append(f"{name} {label} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the game's hot paths and print the results as JSON.")
+    parser.add_argument("--enemies", help="comma separated enemy counts, e.g. 10,100,1000")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scores", type=int, default=HIGHSCORE_ROWS, help="runs in the highscore table")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS),
+                        help="run just this benchmark; may be repeated")
+    parser.add_argument("--output", help="also write the results, with the commit they were run on, here")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="an earlier --output file; exit 1 if any timing got slower than --tolerance")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown, e.g. 0.25 for 25%%")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args)
+    report = {"environment": environment(), "seed": args.seed, "results": results}
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+BENCHMARKS = {
+    "generation": lambda args: bench_generation(seed=args.seed),
+    "render": lambda args: bench_render(seed=args.seed),
+    "moves": lambda args: bench_moves(seed=args.seed),
+    "combat": lambda args: bench_combat(seed=args.seed),
+    "enemy_ai": lambda args: bench_enemy_ai(
+        [int(n) for n in args.enemies.split(",")] if args.enemies else ENEMY_COUNTS, args.rounds, args.seed),
+    "saves": lambda args: bench_saves(seed=args.seed),
+    "highscores": lambda args: bench_highscores(args.scores, args.seed),
+}
+
+if __name__ == "__main__":
+    main()
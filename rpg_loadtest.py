@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+from rpg_server import GO_AHEAD, serve
+
+# --- Load Test Constants ---
+CLIENTS = 1000
+PARTY_CLIENTS = 1  # clients sharing each party
+TURNS = 50  # prompts each client answers before quitting
+MAX_ANSWERS = 100  # per turn allowed, in case a bot gets stuck in a menu
+READ_TIMEOUT = 30.0
+READ_LIMIT = 1 << 22
+
+# Bots only see the text a human would, so answers are picked from the
+# last line of each prompt the way a player would read it.
+ANSWERS = [
+    ("(n)ew party", lambda rng, bot: "n" if bot.code is None else f"j {bot.code}"),
+    ("number of heroes", lambda rng, bot: str(bot.heroes)),
+    ("Enter name", lambda rng, bot: f"Bot {rng.randrange(10000)}"),
+    ("Choose class", lambda rng, bot: rng.choice(["warrior", "mage", "archer"])),
+    ("Move", lambda rng, bot: rng.choice("wasdwasdwasdi")),
+    ("Attack", lambda rng, bot: rng.choice("112")),
+    ("(u)se", lambda rng, bot: rng.choice("uec")),
+    ("Choose a", lambda rng, bot: "1"),
+]
+PARTY_CODE = re.compile(rb"Party code: (\d+)")
+
+class Bot:
+    def __init__(self, rng, heroes, turns, code=None):
+        self.rng = rng
+        self.heroes = heroes
+        self.turns = turns
+        self.code = code
+        self.latencies = []
+        self.answered = 0
+
+    def answer(self, text):
+        last = text.rsplit("\n", 1)[-1]
+        if self.answered >= self.turns and "Move" in last:
+            return "q"
+        for marker, pick in ANSWERS:
+            if marker in last:
+                return pick(self.rng, self)
+        return ""
+
+    async def play(self, host, port, code_future=None):
+        reader, writer = await asyncio.open_connection(host, port, limit=READ_LIMIT)
+        try:
+            sent = None
+            while True:
+                try:
+                    data = await asyncio.wait_for(reader.readuntil(GO_AHEAD), READ_TIMEOUT)
+                except asyncio.IncompleteReadError:
+                    return "finished"
+                if sent is not None:
+                    self.latencies.append(time.perf_counter() - sent)
+                if code_future is not None and not code_future.done():
+                    match = PARTY_CODE.search(data)
+                    if match:
+                        code_future.set_result(match.group(1).decode())
+                if self.answered > self.turns * MAX_ANSWERS:
+                    return "stuck"
+                answer = self.answer(data[:-len(GO_AHEAD)].decode(errors="replace").replace("\r", ""))
+                writer.write(answer.encode() + b"\r\n")
+                await writer.drain()
+                sent = time.perf_counter()
+                self.answered += 1
+        except asyncio.TimeoutError:
+            return "timeout"
+        except ConnectionError:
+            return "disconnected"
+        finally:
+            writer.close()
+
+async def run_party(host, port, size, heroes, turns, rng, bots, outcomes):
+    # The host makes the party, the others join with the code it was given
+    code = asyncio.get_running_loop().create_future()
+    host_bot = Bot(random.Random(rng.getrandbits(64)), heroes, turns)
+    bots.append(host_bot)
+    tasks = [asyncio.create_task(host_bot.play(host, port, code))]
+    if size > 1:
+        party_code = await code
+        for _ in range(size - 1):
+            bot = Bot(random.Random(rng.getrandbits(64)), heroes, turns, party_code)
+            bots.append(bot)
+            tasks.append(asyncio.create_task(bot.play(host, port)))
+    for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+        outcomes.append(outcome if isinstance(outcome, str) else type(outcome).__name__)
+
+async def load_test(clients=CLIENTS, party_clients=PARTY_CLIENTS, turns=TURNS, seed=0, host=None, port=None):
+    server_task = server = None
+    if port is None:
+        # No server given: host one in this process on a free port
+        ready = asyncio.get_running_loop().create_future()
+        db = os.path.join(tempfile.mkdtemp(), "scores.db")
+        server_task = asyncio.create_task(serve("127.0.0.1", 0, ready, highscore_db=db))
+        server, port = await ready
+        host = "127.0.0.1"
+    rng = random.Random(seed)
+    heroes = min(3, max(1, party_clients))
+    bots, outcomes = [], []
+    start = time.perf_counter()
+    parties = [run_party(host, port, min(party_clients, clients - i), heroes, turns, rng, bots, outcomes)
+               for i in range(0, clients, party_clients)]
+    await asyncio.gather(*parties)
+    elapsed = time.perf_counter() - start
+    if server_task is not None:
+        # Let the server see every hang-up before it is shut down
+        while server.connections:
+            await asyncio.sleep(0.01)
+        server_task.cancel()
+    latencies = sorted(t for bot in bots for t in bot.latencies)
+    percentile = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+    answered = sum(bot.answered for bot in bots)
+    return {
+        "clients": len(bots),
+        "parties": len(parties),
+        "answers": answered,
+        "answers_per_second": round(answered / elapsed, 1) if elapsed else None,
+        "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        "outcomes": {name: outcomes.count(name) for name in sorted(set(outcomes))},
+        "seconds": round(elapsed, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive many simulated telnet clients against the game server.")
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--party-clients", type=int, default=PARTY_CLIENTS, help="clients sharing each party")
+    parser.add_argument("--turns", type=int, default=TURNS, help="prompts each client answers before quitting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="an already running server (default: start one here)")
+    args = parser.parse_args()
+    summary = asyncio.run(load_test(args.clients, args.party_clients, args.turns, args.seed,
+                                    args.host, args.port))
+    print(json.dumps(summary, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rpg_terminal import (
+    PROMPT_CODES, REPLAY_FILE, Game, InputLog, SaveFile, TerminalRenderer, load_game, run_result
+)
+
+# --- Replay Constants ---
+CHECKPOINT_EVERY = 100  # turns between checkpoints
+VERIFY_CHUNK = 25  # runs handed to a worker at a time
+MAX_FAILURES = 20  # listed in the report
+PROMPT_KINDS = {code: kind for kind, code in PROMPT_CODES.items()}
+
+class Divergence(Exception):
+    pass
+
+# --- Checkpoints ---
+class Checkpoints:
+    # Stands in for the game's SaveFile. The game calls autosave() at the
+    # start of every turn; every `every` turns the state is snapshotted,
+    # together with how many logged answers it took to get there.
+    def __init__(self, directory, every=CHECKPOINT_EVERY):
+        self.directory = directory
+        self.every = every
+        self.index_path = os.path.join(directory, "index.json")
+        self.index = {}  # turn -> answers used
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = {int(turn): position for turn, position in json.load(f).items()}
+        self.position = 0  # kept up to date by the replay feeding the answers
+
+    def path(self, turn):
+        return os.path.join(self.directory, f"turn{turn}.sav")
+
+    def nearest(self, turn):
+        earlier = [t for t in self.index if t <= turn]
+        return max(earlier) if earlier else None
+
+    def autosave(self, game):
+        turn = game.turns
+        if turn % self.every or turn in self.index:
+            return
+        SaveFile(self.path(turn)).snapshot(game)
+        self.index[turn] = self.position
+        with open(self.index_path, "w") as f:
+            json.dump(self.index, f)
+
+    def close(self):
+        pass
+
+    def discard(self):
+        pass
+
+# --- Replays ---
+class Replay:
+    def __init__(self, log, checkpoint_dir=None, every=CHECKPOINT_EVERY):
+        self.log = log
+        self.every = every
+        self.checkpoint_dir = checkpoint_dir
+        self.tmp = None
+        self.checkpoints = None
+
+    def new_game(self):
+        # Headless and without pregeneration: nothing is drawn, nothing is
+        # written to the highscores, and levels are built on this thread
+        return Game(headless=True, seed=self.log.seed, pregenerate=False, **self.log.config)
+
+    def checkpoint_store(self):
+        if self.checkpoints is None:
+            if self.checkpoint_dir is None:
+                self.tmp = tempfile.TemporaryDirectory()
+                self.checkpoint_dir = self.tmp.name
+            directory = os.path.join(self.checkpoint_dir, self.log.digest())
+            os.makedirs(directory, exist_ok=True)
+            self.checkpoints = Checkpoints(directory, self.every)
+        return self.checkpoints
+
+    def drive(self, game, session, position, stop_turn=None):
+        # Feeds the logged answers from position on. Returns the prompt the
+        # game is waiting at when stop_turn starts or the log runs out, or
+        # None if the run ended, along with the answers used.
+        log, checkpoints = self.log, game.save_file
+        try:
+            prompt = session.send(None)
+            while True:
+                if stop_turn is not None and prompt.kind == "turn" and game.turns >= stop_turn:
+                    return prompt, position
+                if position >= len(log.answers):
+                    return prompt, position
+                logged = log.kinds[position]
+                if PROMPT_CODES[prompt.kind] != logged:
+                    raise Divergence(f"answer {position} (turn {game.turns}) was given to a "
+                                     f"{PROMPT_KINDS[logged]} prompt, but the game asked {prompt.kind}")
+                position += 1
+                if checkpoints is not None:
+                    checkpoints.position = position
+                prompt = session.send(log.answers[position - 1])
+        except StopIteration:
+            if position < len(log.answers):
+                raise Divergence(f"the run ended at turn {game.turns} with "
+                                 f"{len(log.answers) - position} logged answers unused") from None
+            return None, position
+
+    def verify(self):
+        # Returns what differs from the logged run; empty when it matches
+        game = self.new_game()
+        try:
+            self.drive(game, game.play(), 0)
+        except Divergence as e:
+            return [str(e)]
+        expected = self.log.result or {}
+        return [f"{key}: logged {expected.get(key)!r}, replayed {value!r}"
+                for key, value in run_result(game).items() if expected.get(key) != value]
+
+    def seek(self, turn):
+        # Restores the nearest checkpoint at or before the turn and replays
+        # from there. Returns the game, its session and the prompt it is
+        # waiting at, which is None if the run ended first.
+        checkpoints = self.checkpoint_store()
+        start = checkpoints.nearest(turn)
+        if start is None:
+            game = self.new_game()
+            session, position = game.play(), 0
+        else:
+            game = load_game(checkpoints.path(start), headless=True, pregenerate=False)
+            session, position = game.resume(), checkpoints.index[start]
+        game.save_file = checkpoints
+        checkpoints.position = position
+        prompt, _ = self.drive(game, session, position, stop_turn=turn)
+        return game, session, prompt
+
+    def close(self):
+        if self.tmp is not None:
+            self.tmp.cleanup()
+            self.tmp = None
+
+def resume_at(prompt, session):
+    # A session that starts by asking again the prompt a replay stopped at
+    answer = yield prompt
+    while True:
+        try:
+            prompt = session.send(answer)
+        except StopIteration:
+            return
+        answer = yield prompt
+
+# --- Bulk Verification ---
+def verify_chunk(lines):
+    return [(i, Replay(InputLog.from_json(line)).verify()) for i, line in lines]
+
+def verify_archive(path, workers=1, chunk=VERIFY_CHUNK):
+    with open(path) as f:
+        lines = [(i, line) for i, line in enumerate(f) if line.strip()]
+    chunks = [lines[i:i + chunk] for i in range(0, len(lines), chunk)]
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = [row for rows in pool.map(verify_chunk, chunks) for row in rows]
+    else:
+        results = [row for rows in map(verify_chunk, chunks) for row in rows]
+    elapsed = time.perf_counter() - start
+    failures = [{"run": i, "problems": problems} for i, problems in results if problems]
+    return {
+        "runs": len(results),
+        "verified": len(results) - len(failures),
+        "diverged": len(failures),
+        "runs_per_second": round(len(results) / elapsed, 1) if elapsed else None,
+        "failures": failures[:MAX_FAILURES],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run logged games to verify them, or jump into one at a given turn.")
+    parser.add_argument("log", nargs="?", default=REPLAY_FILE, help="JSONL file of logged runs")
+    parser.add_argument("--run", type=int, default=-1, help="which run of the file to open (default: the last)")
+    parser.add_argument("--turn", type=int, help="replay --run up to this turn, then carry on playing it")
+    parser.add_argument("--checkpoints", help="keep checkpoints here, so later jumps into the same run are quick")
+    parser.add_argument("--every", type=int, default=CHECKPOINT_EVERY, help="turns between checkpoints")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes used to verify")
+    args = parser.parse_args()
+
+    if args.turn is None:
+        summary = verify_archive(args.log, args.workers)
+        print(json.dumps(summary, indent=4))
+        sys.exit(1 if summary["diverged"] else 0)
+
+    with open(args.log) as f:
+        lines = [line for line in f if line.strip()]
+    replay = Replay(InputLog.from_json(lines[args.run]), args.checkpoints, args.every)
+    try:
+        start = time.perf_counter()
+        game, session, prompt = replay.seek(args.turn)
+        print(f"Replayed to turn {game.turns} in {time.perf_counter() - start:.3f}s.")
+        if prompt is None:
+            print(f"The run ended at turn {game.turns}.")
+            return
+        # From here on it is an ordinary game, apart from the highscores
+        game.renderer = TerminalRenderer()
+        game.highscore_db = ":memory:"
+        game.save_file = None
+        game.renderer.clear()
+        game.print_game()
+        game.run(session=resume_at(prompt, session))
+    finally:
+        replay.close()
+
+if __name__ == "__main__":
+    main()
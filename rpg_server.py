@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+import argparse
+import asyncio
+import itertools
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from rpg_terminal import HIGHSCORE_DB, Game, TerminalRenderer
+
+# --- Server Constants ---
+HOST = "127.0.0.1"
+PORT = 4000
+MAX_LINE = 1024
+BACKLOG = 4096  # connections waiting to be accepted, for bursts of logins
+MAX_BUFFERED = 1 << 20  # clients that fall this far behind are dropped
+IAC, GA = 255, 249
+GO_AHEAD = bytes((IAC, GA))  # ends every prompt, so clients know input is wanted
+
+log = logging.getLogger("rpg_server")
+
+def strip_telnet(data):
+    # Drop telnet commands; options are never negotiated, only refused silently
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        if data[i] == IAC and i + 1 < len(data):
+            i += 3 if 251 <= data[i + 1] <= 254 else 2
+            continue
+        out.append(data[i])
+        i += 1
+    return bytes(out)
+
+# --- Output ---
+class SessionStream:
+    # The renderer's stream. Frames and echoed text are buffered while the
+    # game steps and sent to every client in the party on flush.
+    def __init__(self, session):
+        self.session = session
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def flush(self):
+        if self.parts:
+            data = "".join(self.parts).replace("\n", "\r\n").encode()
+            self.parts = []
+            for client in list(self.session.clients):
+                client.send(data)
+
+class ClientRenderer(TerminalRenderer):
+    # The server's own terminal size says nothing about the clients'
+    def fits_terminal(self, height):
+        return True
+
+class ServerGame(Game):
+    # The highscore write can wait HIGHSCORE_TIMEOUT on another process, so
+    # the session runs it on a thread of its own once the game has stopped
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.highscores_due = False
+
+    def update_highscores(self):
+        self.highscores_due = True
+
+# --- Sessions ---
+class Client:
+    def __init__(self, reader, writer, number):
+        self.reader = reader
+        self.writer = writer
+        self.name = f"Player {number}"
+        self.session = None
+
+    def send(self, data):
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            log.warning("dropping %s, too far behind", self.name)
+            self.writer.close()
+            return
+        self.writer.write(data)
+
+    def say(self, text):
+        self.send(text.replace("\n", "\r\n").encode())
+
+class Session:
+    # One Game driven through its play() generator. Decisions about a hero
+    # go to the client that hero is assigned to, spreading the game's turn
+    # rotation across everyone in the party; setup prompts go to the host.
+    # Steps run on the server's game thread, so the event loop keeps serving
+    # other parties while a level is generated; no prompt is open meanwhile.
+    def __init__(self, code, highscore_db=HIGHSCORE_DB, steps=None):
+        self.code = code
+        self.clients = []
+        self.steps = steps
+        # Pregeneration would mean a worker thread per party
+        self.game = ServerGame(pregenerate=False)
+        self.game.renderer = ClientRenderer(SessionStream(self))
+        self.game.highscore_db = highscore_db
+        self.play = self.game.play()
+        self.prompt = None
+        self.waiting_on = None
+        self.stepping = False
+        self.redraw = False  # someone joined during a step
+        self.closing = False  # everyone left during a step
+        self.finished = False
+
+    async def start(self):
+        await self.advance(None)
+
+    def owner(self, prompt):
+        players = self.game.players
+        if prompt.player in players:
+            return self.clients[players.index(prompt.player) % len(self.clients)]
+        return self.clients[0]
+
+    def join(self, client):
+        client.session = self
+        self.clients.append(client)
+        if self.stepping:
+            self.redraw = True
+        if self.prompt is None:
+            return
+        # Newcomers need a full frame rather than a diff against nothing
+        self.game.renderer.invalidate()
+        if self.game.dungeon is not None:
+            self.game.print_game()
+        self.ask(force=True)
+
+    def leave(self, client):
+        self.clients.remove(client)
+        client.session = None
+        if not self.clients:
+            self.close()
+        elif self.prompt is not None:
+            self.ask(force=True)
+
+    async def answer(self, client, line):
+        if self.prompt is None:
+            return
+        if client is not self.owner(self.prompt):
+            client.say("It's not your turn.\n")
+            return
+        await self.advance(line)
+
+    async def advance(self, answer):
+        loop = asyncio.get_running_loop()
+        self.prompt, self.stepping = None, True
+        try:
+            prompt = await loop.run_in_executor(self.steps, self.step, answer)
+            if self.game.highscores_due:
+                self.game.highscores_due = False
+                try:
+                    self.game.show_highscores(await loop.run_in_executor(None, self.game.record_highscore))
+                except sqlite3.Error:
+                    log.exception("session %s could not record its highscore", self.code)
+        finally:
+            self.stepping = False
+        if self.closing:
+            self.close()
+            return
+        redraw, self.redraw = self.redraw and prompt is not None, False
+        if redraw:
+            self.game.renderer.invalidate()
+            if self.game.dungeon is not None:
+                self.game.print_game()
+        self.game.renderer.stream.flush()
+        self.prompt = prompt
+        if prompt is None:
+            self.close()
+        else:
+            self.ask(force=redraw)
+
+    def step(self, answer):
+        try:
+            return self.play.send(answer)
+        except StopIteration:
+            return None
+        except Exception:
+            log.exception("session %s crashed", self.code)
+            return None
+
+    def ask(self, force=False):
+        owner = self.owner(self.prompt)
+        if owner is not self.waiting_on or force:
+            self.waiting_on = owner
+            hero = self.prompt.player.name if self.prompt.player else "the party"
+            for client in self.clients:
+                if client is not owner:
+                    client.say(f"\nWaiting for {owner.name} to play {hero}...\n")
+        owner.send(self.prompt.text.replace("\n", "\r\n").encode() + GO_AHEAD)
+
+    def close(self):
+        if self.finished:
+            return
+        if self.stepping:
+            # The generator can't be closed while the game thread runs it
+            self.closing = True
+            return
+        self.finished = True
+        self.play.close()
+        self.game.stop_pregeneration()
+        for client in self.clients:
+            client.say("\nThe game is over. Goodbye!\n")
+            client.writer.close()
+
+class GameServer:
+    def __init__(self, highscore_db=HIGHSCORE_DB):
+        self.highscore_db = highscore_db
+        # One thread for every party's steps: games share the entity and
+        # item stores, so they can't step at the same time
+        self.steps = ThreadPoolExecutor(max_workers=1, thread_name_prefix="game")
+        self.sessions = {}
+        self.codes = itertools.count(1)
+        self.numbers = itertools.count(1)
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        client = Client(reader, writer, next(self.numbers))
+        self.connections += 1
+        try:
+            client.send(b"Welcome to the dungeon!\r\n(n)ew party or (j)oin <code>: " + GO_AHEAD)
+            while not writer.is_closing():
+                line = await reader.readline()
+                if not line:
+                    break
+                text = strip_telnet(line).decode(errors="replace").strip()
+                if client.session is None:
+                    await self.lobby(client, text)
+                elif client.session.finished:
+                    break
+                else:
+                    await client.session.answer(client, text)
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.connections -= 1
+            session = client.session
+            if session is not None:
+                session.leave(client)
+                if session.finished:
+                    self.sessions.pop(session.code, None)
+            writer.close()
+
+    async def lobby(self, client, text):
+        command, _, code = text.partition(" ")
+        if command.lower() in ("n", "new"):
+            session = Session(str(next(self.codes)), self.highscore_db, self.steps)
+            self.sessions[session.code] = session
+            client.say(f"Party code: {session.code}. Friends can join with 'j {session.code}'.\n")
+            session.join(client)
+            await session.start()
+        elif command.lower() in ("j", "join") and code.strip() in self.sessions:
+            session = self.sessions[code.strip()]
+            if session.finished:
+                client.send(b"That party has finished.\r\n(n)ew party or (j)oin <code>: " + GO_AHEAD)
+                return
+            client.say(f"Joined party {session.code} as {client.name}.\n")
+            session.join(client)
+        else:
+            client.send(b"Unknown party.\r\n(n)ew party or (j)oin <code>: " + GO_AHEAD)
+
+    def reap(self):
+        for code in [code for code, session in self.sessions.items() if session.finished]:
+            del self.sessions[code]
+
+async def serve(host=HOST, port=PORT, ready=None, highscore_db=HIGHSCORE_DB):
+    server = GameServer(highscore_db)
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_LINE, backlog=BACKLOG)
+    if ready is not None:
+        ready.set_result((server, listener.sockets[0].getsockname()[1]))
+    try:
+        async with listener:
+            while True:
+                await asyncio.sleep(30)
+                server.reap()
+    finally:
+        server.steps.shutdown(wait=False, cancel_futures=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many parties over telnet in one process.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    log.info("listening on %s:%d", args.host, args.port)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
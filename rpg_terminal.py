@@ -1,145 +1,520 @@
 #!/usr/bin/env python
 import random
 import os
+import sys
 import json
-from collections import deque
+import shutil
+import hashlib
+import glob
+import marshal
+import argparse
+import struct
+import mmap
+import array
+import sqlite3
+import time
+import re
+import select
+import threading
+import functools
+import inspect
+import cProfile
+import pstats
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from itertools import count, islice
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import termios
+    import tty
+except ImportError:  # Windows: only line input is available
+    termios = tty = None
 
 # --- Constants ---
 MAP_WIDTH = 40
 MAP_HEIGHT = 20
+VIEW_WIDTH = 40  # size of the map window drawn around the current hero
+VIEW_HEIGHT = 20
 ROOM_MAX_SIZE = 10
 ROOM_MIN_SIZE = 6
 MAX_ROOMS = 15
 MAX_DUNGEON_LEVEL = 5
-HIGHSCORE_FILE = "rpg_highscores.json"
-
-# --- UI Elements ---
-UI = {
-    "player": "🤺",
-    "warrior": "🤺",
-    "mage": "🧙",
-    "archer": "🏹",
-    "goblin": "👺",
-    "orc": "👹",
-    "troll": "👾",
-    "dragon": "🐉",
-    "potion": "🧪",
-    "weapon": "⚔️",
-    "armor": "🛡️",
-    "wall": "🧱",
-    "floor": "⬛",
-    "stairs": "🔽",
-    "hp": "❤️",
-    "xp": "✨",
-    "mana": "💧",
-    "attack": "💥",
-    "defense": "🛡️",
-    "level": "🌟"
+CHUNK_SIZE = 48
+CHUNK_ROOMS = 8
+WORLD_CHUNKS = 1 << 16  # per axis, so the world is effectively unbounded
+GOAL_RANGE = 2  # the chunk holding a world level's stairs or boss is this close to the start
+MAX_LOADED_CHUNKS = 64
+LOAD_RADIUS = 1  # chunks kept loaded around each hero
+CHASE_RADIUS = 10  # enemies this many steps from a hero start chasing
+LEVEL_SERIALS = count()  # every level built gets the next one
+TARGET_FPS = 30  # redraw rate of the --realtime key loop
+HIGHSCORE_FILE = "rpg_highscores.json"  # old top-10 list, imported into the database once
+HIGHSCORE_DB = "rpg_highscores.db"
+HIGHSCORE_TIMEOUT = 10.0  # seconds to wait for another session's write
+
+# --- Content ---
+# UI icons, classes, enemies, weapons and armor come from JSON content packs:
+# every *.json in content/, then the files and directories listed in
+# $RPG_CONTENT, in that order. Later packs add entries or replace earlier
+# ones by name. The merged and validated result is cached in a compiled
+# file keyed by a hash of the packs, so unchanged content is never parsed
+# or validated twice.
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+CONTENT_ENV = "RPG_CONTENT"
+CONTENT_CACHE = os.path.join(CONTENT_DIR, "rpg_content.cache")
+CONTENT_MAGIC = b"RPGC"
+CONTENT_VERSION = 3  # bump when the compiled layout or the checks change
+UI_KEYS = ("player", "potion", "weapon", "armor", "wall", "floor", "stairs",
+           "hp", "xp", "mana", "attack", "defense", "level")
+CONTENT_FIELDS = {
+    "classes": ({"hp": int, "attack": int, "defense": int, "weapon": str, "mana": int},
+                {"icon": str, "aura": dict}),
+    "enemies": ({"hp": int, "attack": int, "defense": int, "xp": int}, {"icon": str, "boss": bool}),
+    "weapons": ({"name": str, "attack": int}, {}),
+    "armor": ({"name": str, "defense": int}, {}),
+    "aura": ({"target": str}, {"attack": int, "defense": int}),
 }
+AURA_TARGETS = ("party", "enemies")
+POTION_NAME = "Health Potion"  # built in rather than defined by a pack
+
+class ContentError(Exception):
+    pass
+
+def content_paths():
+    paths = sorted(glob.glob(os.path.join(CONTENT_DIR, "*.json")))
+    for entry in filter(None, os.environ.get(CONTENT_ENV, "").split(os.pathsep)):
+        paths.extend(sorted(glob.glob(os.path.join(entry, "*.json"))) if os.path.isdir(entry) else [entry])
+    return paths
+
+def check_entry(where, entry, section):
+    required, optional = CONTENT_FIELDS[section]
+    if not isinstance(entry, dict):
+        raise ContentError(f"{where}: expected an object")
+    for key, kind in required.items():
+        # type() rather than isinstance(), so true is not taken for 1
+        if type(entry.get(key)) is not kind:
+            raise ContentError(f"{where}.{key}: expected {kind.__name__}, got {entry.get(key)!r}")
+    for key, value in entry.items():
+        if key not in required and type(value) is not optional.get(key):
+            raise ContentError(f"{where}.{key}: unknown field or wrong type")
+    if "aura" in entry:
+        check_entry(f"{where}.aura", entry["aura"], "aura")
+        if entry["aura"]["target"] not in AURA_TARGETS:
+            raise ContentError(f"{where}.aura.target: expected one of {', '.join(AURA_TARGETS)}")
+
+def merge_pack(content, path, pack):
+    if not isinstance(pack, dict) or set(pack) - set(content):
+        raise ContentError(f"{path}: expected an object with some of {', '.join(content)}")
+    ui = pack.get("ui", {})
+    if not isinstance(ui, dict) or not all(isinstance(icon, str) for icon in ui.values()):
+        raise ContentError(f"{path}: ui maps names to icon strings")
+    content["ui"].update(ui)
+    for section in ("classes", "enemies"):
+        entries = pack.get(section, {})
+        if not isinstance(entries, dict):
+            raise ContentError(f"{path}: {section} maps names to definitions")
+        for name, entry in entries.items():
+            check_entry(f"{path}: {section}.{name}", entry, section)
+            content[section][name] = entry
+    for section in ("weapons", "armor"):
+        entries = pack.get(section, [])
+        if not isinstance(entries, list):
+            raise ContentError(f"{path}: {section} is a list of definitions")
+        for i, entry in enumerate(entries):
+            check_entry(f"{path}: {section}[{i}]", entry, section)
+            content[section][entry["name"]] = entry
+
+def compile_content(paths):
+    content = {"ui": {}, "classes": {}, "enemies": {}, "weapons": {}, "armor": {}}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            try:
+                pack = json.load(f)
+            except ValueError as e:
+                raise ContentError(f"{path}: {e}") from None
+        merge_pack(content, path, pack)
+    ui = content["ui"]
+    missing = [key for key in UI_KEYS if key not in ui]
+    if missing:
+        raise ContentError(f"no icon for {', '.join(missing)} in ui")
+    for section in ("classes", "enemies"):
+        if not content[section]:
+            raise ContentError(f"no {section} defined")
+        for name, entry in content[section].items():
+            if "icon" not in entry and name not in ui:
+                raise ContentError(f"{section}.{name} has no icon field and no ui entry")
+            entry.setdefault("icon", ui.get(name))
+    bosses = [name for name, entry in content["enemies"].items() if entry.get("boss")]
+    if len(bosses) != 1 or len(content["enemies"]) < 2:
+        raise ContentError("enemies need exactly one boss and at least one other enemy")
+    if set(content["weapons"]) & set(content["armor"]):
+        raise ContentError("weapons and armor share the names " + ", ".join(set(content["weapons"]) & set(content["armor"])))
+    # Starting weapons and the potion are made by the game, with their own
+    # bonuses, so a pack item by the same name would be taken for them
+    reserved = {entry["weapon"] for entry in content["classes"].values()} | {POTION_NAME}
+    clashes = reserved & (set(content["weapons"]) | set(content["armor"]))
+    if clashes:
+        raise ContentError("item names reserved for starting weapons or the potion: " + ", ".join(sorted(clashes)))
+    # Items are compiled to (name, bonus) pairs, in the order they were defined
+    content["weapons"] = [(entry["name"], entry["attack"]) for entry in content["weapons"].values()]
+    content["armor"] = [(entry["name"], entry["defense"]) for entry in content["armor"].values()]
+    return content
+
+def load_content(paths=None, cache=CONTENT_CACHE):
+    paths = content_paths() if paths is None else paths
+    # marshal's format is only stable within one Python version
+    digest = hashlib.sha256(f"{CONTENT_VERSION}:{sys.version_info[:2]}".encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest.update(len(data).to_bytes(8, "big") + data)
+    key = CONTENT_MAGIC + digest.digest()
+    try:
+        with open(cache, "rb") as f:
+            if f.read(len(key)) == key:
+                # One read; marshal.load() on the file reads it piecemeal
+                return marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    content = compile_content(paths)
+    try:
+        # Written aside and renamed, as several processes may start at once
+        tmp = f"{cache}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(key)
+            marshal.dump(content, f)
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # a read-only install just compiles on every start
+    return content
+
+CONTENT = load_content()
+UI = CONTENT["ui"]
 
+# --- Tiles ---
+# The map is stored as one byte per tile; emoji are only looked up when drawing
+TILE_WALL = 0
+TILE_FLOOR = 1
+TILE_STAIRS = 2
+TILE_ICONS = (UI["wall"], UI["floor"], UI["stairs"])
+WALKABLE_DIGITS = bytes.maketrans(bytes((TILE_WALL, TILE_FLOOR, TILE_STAIRS)), b"011")
 
 # --- Character Classes ---
-CLASSES = {
-    "warrior": {"hp": 120, "attack": 15, "defense": 10, "icon": UI["warrior"], "weapon": "Sword", "mana": 0},
-    "mage": {"hp": 80, "attack": 20, "defense": 5, "icon": UI["mage"], "weapon": "Staff", "mana": 20},
-    "archer": {"hp": 100, "attack": 12, "defense": 8, "icon": UI["archer"], "weapon": "Bow", "mana": 0}
-}
+CLASSES = CONTENT["classes"]
+CLASS_NAMES = list(CLASSES)
 
 # --- Enemy Types ---
-ENEMIES = {
-    "goblin": {"hp": 30, "attack": 8, "defense": 2, "xp": 50, "icon": UI["goblin"]},
-    "orc": {"hp": 50, "attack": 12, "defense": 4, "xp": 100, "icon": UI["orc"]},
-    "troll": {"hp": 80, "attack": 15, "defense": 6, "xp": 150, "icon": UI["troll"]},
-    "dragon": {"hp": 250, "attack": 25, "defense": 15, "xp": 1000, "icon": UI["dragon"]}
-}
+ENEMIES = CONTENT["enemies"]
+
+ENEMY_TYPES = list(ENEMIES)
+ENEMY_NAMES = [name.capitalize() for name in ENEMY_TYPES]
+
+# Dict order is fixed, unlike set order, which matters for seeded generation
+SPAWNABLE_ENEMIES = [name for name in ENEMIES if not ENEMIES[name].get("boss")]
+BOSS_ENEMY = next(name for name in ENEMIES if ENEMIES[name].get("boss"))
+
+# --- Seeds ---
+def derive_seed(*parts):
+    # Stable across processes and Python versions, unlike hash()
+    digest = hashlib.sha256(":".join(str(p) for p in parts).encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+def new_run_seed():
+    return random.SystemRandom().getrandbits(63)
 
 # --- Items ---
+# Items are flyweights: one read-only template per kind of item, shared by
+# every drop and inventory slot that holds it. Levels keep their drops in an
+# ItemTable and inventories hold template ids.
 class Item:
+    __slots__ = ("id", "name", "icon")
+
     def __init__(self, name, icon):
         self.name = name
         self.icon = icon
 
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"{type(self).__name__} templates are shared and read-only")
+        super().__setattr__(name, value)
+
 class Potion(Item):
+    __slots__ = ("hp_gain",)
+
     def __init__(self, name, hp_gain):
         super().__init__(name, UI["potion"])
         self.hp_gain = hp_gain
 
     def use(self, target):
         target.hp = min(target.max_hp, target.hp + self.hp_gain)
-        return f'{target.name} used {self.name} and gained {self.hp_gain} HP.'
 
 class Weapon(Item):
+    __slots__ = ("attack_bonus",)
+
     def __init__(self, name, attack_bonus):
         super().__init__(name, UI["weapon"])
         self.attack_bonus = attack_bonus
 
 class Armor(Item):
+    __slots__ = ("defense_bonus",)
+
     def __init__(self, name, defense_bonus):
         super().__init__(name, UI["armor"])
         self.defense_bonus = defense_bonus
 
+ITEMS = []  # template id -> template
+ITEM_IDS = {}  # (template type, name) -> template id
+
+def register_item(template):
+    template.id = len(ITEMS)
+    ITEMS.append(template)
+    ITEM_IDS[(type(template), template.name)] = template.id
+    return template
+
+def item_template(item_type, name, bonus):
+    # The template of this type and name, added if it is not known here, as
+    # for an item from a save made with other content
+    template_id = ITEM_IDS.get((item_type, name))
+    if template_id is not None:
+        return ITEMS[template_id]
+    return register_item(item_type(name, bonus))
+
+class ItemTable:
+    # Items lying on a level, one row of (template id, x, y) per drop. Rows
+    # are plain ints, which is what the position index and saves refer to.
+    EMPTY = 0xFFFF
+
+    def __init__(self):
+        self.template = array.array("H")
+        self.x = array.array("i")
+        self.y = array.array("i")
+        self.free = []
+
+    def add(self, template_id, x, y, row=None):
+        if row is None:
+            row = self.free.pop() if self.free else len(self.template)
+        elif row in self.free:
+            self.free.remove(row)
+        grow = row + 1 - len(self.template)
+        if grow > 0:
+            # Rows skipped over when restoring a save stay free
+            self.free.extend(range(len(self.template), row))
+            self.template.extend([self.EMPTY] * grow)
+            self.x.extend([0] * grow)
+            self.y.extend([0] * grow)
+        self.template[row], self.x[row], self.y[row] = template_id, x, y
+        return row
+
+    def remove(self, row):
+        if self.template[row] != self.EMPTY:
+            self.template[row] = self.EMPTY
+            self.free.append(row)
+
+    def __getitem__(self, row):
+        return ITEMS[self.template[row]]
+
+    def __iter__(self):
+        empty = self.EMPTY
+        return (row for row, template_id in enumerate(self.template) if template_id != empty)
+
+    def __len__(self):
+        return len(self.template) - len(self.free)
+
 # --- Pre-defined Items ---
-WEAPONS = [
-    Weapon("Dagger", 3),
-    Weapon("Short Sword", 5),
-    Weapon("Long Sword", 7),
-    Weapon("Battle Axe", 10)
-]
+HEALTH_POTION = register_item(Potion(POTION_NAME, 20))
 
-ARMOR = [
-    Armor("Leather Armor", 3),
-    Armor("Chainmail", 5),
-    Armor("Plate Armor", 7)
-]
+WEAPONS = [register_item(Weapon(name, bonus)) for name, bonus in CONTENT["weapons"]]
+ARMOR = [register_item(Armor(name, bonus)) for name, bonus in CONTENT["armor"]]
+
+STARTING_WEAPONS = {name: item_template(Weapon, stats["weapon"], 5) for name, stats in CLASSES.items()}
 
 # --- Entities ---
+class EntityStore:
+    # Positions and stats of every entity live in parallel typed arrays, one
+    # row per entity, so passes over a whole population can read the columns
+    # directly instead of going through each object
+    FIELDS = ("x", "y", "hp", "max_hp", "base_attack", "base_defense", "attack", "defense", "kind")
+
+    def __init__(self):
+        self.columns = [array.array("i") for _ in self.FIELDS]
+        (self.x, self.y, self.hp, self.max_hp, self.base_attack, self.base_defense,
+         self.attack, self.defense, self.kind) = self.columns
+        self.modifiers = {}  # row -> {source: Modifier}, only for rows that have any
+        self.free = []
+        # Levels are also generated on the pregeneration thread
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.x) - len(self.free)
+
+    def allocate(self, *values):
+        try:
+            row = self.free.pop()
+        except IndexError:
+            with self.lock:
+                row = len(self.x)
+                for column in self.columns:
+                    column.append(0)
+        for column, value in zip(self.columns, values):
+            column[row] = value
+        return row
+
+    def release(self, row):
+        self.modifiers.pop(row, None)
+        self.free.append(row)
+
+    def refresh(self, row):
+        # The attack and defense columns cache the effective stats and are
+        # only rebuilt here, when a base stat or a modifier changes
+        attack, defense = self.base_attack[row], self.base_defense[row]
+        for modifier in self.modifiers.get(row, {}).values():
+            attack += modifier.attack
+            defense += modifier.defense
+        self.attack[row] = attack
+        self.defense[row] = defense
+
+    def modify(self, row, modifier):
+        self.modifiers.setdefault(row, {})[modifier.source] = modifier
+        self.refresh(row)
+
+    def unmodify(self, row, source):
+        modifiers = self.modifiers.get(row)
+        if modifiers and modifiers.pop(source, None) is not None:
+            if not modifiers:
+                del self.modifiers[row]
+            self.refresh(row)
+
+    def living(self, entities):
+        hp = self.hp
+        return [e for e in entities if hp[e.id] > 0]
+
+    def any_alive(self, entities):
+        hp = self.hp
+        return any(hp[e.id] > 0 for e in entities)
+
+ENTITIES = EntityStore()
+
+class Modifier:
+    # A change to attack and defense from one source: equipment or an aura.
+    # Applying a modifier with the same source again replaces it.
+    __slots__ = ("source", "attack", "defense")
+
+    def __init__(self, source, attack=0, defense=0):
+        self.source = source
+        self.attack = attack
+        self.defense = defense
+
+def stored(column, refresh=False):
+    # An attribute kept in this entity's row of a store column
+    def get(self):
+        return column[self.id]
+
+    def set(self, value):
+        column[self.id] = value
+        if refresh:
+            self.store.refresh(self.id)
+
+    return property(get, set)
+
 class Entity:
-    def __init__(self, x, y, name, hp, attack, defense, icon):
-        self.x = x
-        self.y = y
-        self.name = name
-        self.base_attack = attack
-        self.base_defense = defense
-        self.max_hp = hp
-        self.hp = hp
-        self.icon = icon
+    # Entities are handles onto a row of ENTITIES. The row is reused once the
+    # handle is garbage, so a dead enemy still referenced elsewhere stays valid.
+    __slots__ = ("id",)
+    store = ENTITIES
+    x = stored(ENTITIES.x)
+    y = stored(ENTITIES.y)
+    hp = stored(ENTITIES.hp)
+    max_hp = stored(ENTITIES.max_hp)
+    base_attack = stored(ENTITIES.base_attack, refresh=True)
+    base_defense = stored(ENTITIES.base_defense, refresh=True)
+
+    def __init__(self, x, y, hp, attack, defense, kind):
+        self.id = self.store.allocate(x, y, hp, hp, attack, defense, attack, defense, kind)
+
+    def __del__(self):
+        # A subclass __init__ that failed before allocating has no row
+        row = getattr(self, "id", None)
+        if row is not None:
+            self.store.release(row)
 
     @property
     def attack(self):
-        bonus = self.weapon.attack_bonus if hasattr(self, 'weapon') and self.weapon else 0
-        return self.base_attack + bonus
+        return self.store.attack[self.id]
 
     @property
     def defense(self):
-        bonus = self.armor.defense_bonus if hasattr(self, 'armor') and self.armor else 0
-        return self.base_defense + bonus
+        return self.store.defense[self.id]
+
+    def add_modifier(self, modifier):
+        self.store.modify(self.id, modifier)
+
+    def remove_modifier(self, source):
+        self.store.unmodify(self.id, source)
 
     def is_alive(self):
-        return self.hp > 0
+        return self.store.hp[self.id] > 0
 
     def take_damage(self, damage):
-        self.hp -= damage
-        if self.hp < 0:
-            self.hp = 0
+        self.hp = max(0, self.hp - damage)
 
 class Player(Entity):
+    __slots__ = ("name", "xp", "total_xp", "level", "inventory", "wielded", "worn", "max_mana", "mana",
+                 "skill_cooldown")
+
     def __init__(self, x, y, name, char_class):
-        super().__init__(x, y, name, CLASSES[char_class]["hp"], CLASSES[char_class]["attack"], CLASSES[char_class]["defense"], CLASSES[char_class]["icon"])
-        self.char_class = char_class
+        stats = CLASSES[char_class]
+        super().__init__(x, y, stats["hp"], stats["attack"], stats["defense"], CLASS_NAMES.index(char_class))
+        self.name = name
         self.xp = 0
+        self.total_xp = 0
         self.level = 1
-        self.inventory = [Weapon(CLASSES[char_class]["weapon"], 5)]
-        self.weapon = self.inventory[0]
+        self.weapon = STARTING_WEAPONS[char_class]
+        self.inventory = [self.weapon.id]
         self.armor = None
-        self.max_mana = CLASSES[char_class]["mana"]
+        self.max_mana = stats["mana"]
         self.mana = self.max_mana
         self.skill_cooldown = 0
 
+    @property
+    def char_class(self):
+        return CLASS_NAMES[self.store.kind[self.id]]
+
+    @property
+    def icon(self):
+        return CLASSES[self.char_class]["icon"]
+
+    @property
+    def weapon(self):
+        return self.wielded
+
+    @weapon.setter
+    def weapon(self, weapon):
+        self.wielded = weapon
+        if weapon:
+            self.add_modifier(Modifier("weapon", attack=weapon.attack_bonus))
+        else:
+            self.remove_modifier("weapon")
+
+    @property
+    def armor(self):
+        return self.worn
+
+    @armor.setter
+    def armor(self, armor):
+        self.worn = armor
+        if armor:
+            self.add_modifier(Modifier("armor", defense=armor.defense_bonus))
+        else:
+            self.remove_modifier("armor")
+
     def gain_xp(self, xp):
         self.xp += xp
+        self.total_xp += xp
         if self.xp >= self.level * 100:
-            return self.level_up()
-        return None
+            self.level_up()
+            return True
+        return False
 
     def level_up(self):
         self.level += 1
@@ -150,12 +525,93 @@ class Player(Entity):
         self.max_mana += 5
         self.mana = self.max_mana
         self.xp = 0
-        return f'\n{self.name} leveled up to level {self.level}! Stats increased.'
 
 class Enemy(Entity):
+    # Name, icon and XP all follow from the type, so only the row is kept
+    __slots__ = ("spawn_id",)
+
     def __init__(self, x, y, enemy_type):
-        super().__init__(x, y, enemy_type.capitalize(), ENEMIES[enemy_type]["hp"], ENEMIES[enemy_type]["attack"], ENEMIES[enemy_type]["defense"], ENEMIES[enemy_type]["icon"])
-        self.xp = ENEMIES[enemy_type]["xp"]
+        stats = ENEMIES[enemy_type]
+        super().__init__(x, y, stats["hp"], stats["attack"], stats["defense"], ENEMY_TYPES.index(enemy_type))
+
+    @property
+    def enemy_type(self):
+        return ENEMY_TYPES[self.store.kind[self.id]]
+
+    @property
+    def name(self):
+        return ENEMY_NAMES[self.store.kind[self.id]]
+
+    @property
+    def icon(self):
+        return ENEMIES[self.enemy_type]["icon"]
+
+    @property
+    def xp(self):
+        return ENEMIES[self.enemy_type]["xp"]
+
+# --- Spatial Index ---
+class PositionIndex:
+    def __init__(self):
+        self.cells = {}
+
+    def add(self, obj, x, y):
+        cell = self.cells.get((x, y))
+        if cell is None:
+            self.cells[(x, y)] = [obj]
+        else:
+            cell.append(obj)
+
+    def remove(self, obj, x, y):
+        cell = self.cells.get((x, y))
+        if cell is not None and obj in cell:
+            cell.remove(obj)
+            if not cell:
+                del self.cells[(x, y)]
+
+    def move(self, obj, x, y):
+        self.remove(obj, obj.x, obj.y)
+        obj.x = x
+        obj.y = y
+        self.add(obj, x, y)
+
+    def at(self, x, y):
+        return self.cells.get((x, y), ())
+
+# --- Enemy AI ---
+STEPS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+class DistanceMap:
+    # Multi-source BFS distances from every living hero, shared by all
+    # enemies. Only rebuilt when a hero moves or the level changes, and
+    # bounded by radius so the cost does not depend on the map size.
+    def __init__(self, radius=CHASE_RADIUS):
+        self.radius = radius
+        self.key = None
+        self.dist = {}
+        self.rebuilds = 0
+
+    def update(self, dungeon, sources):
+        # Not id(dungeon): a new level can be allocated at the old one's address
+        key = (dungeon.serial, tuple(sorted(sources)))
+        if key == self.key:
+            return self.dist
+        dist = {pos: 0 for pos in sources}
+        queue = deque(sources)
+        radius = self.radius
+        tile, width, height = dungeon.tile, dungeon.width, dungeon.height
+        while queue:
+            x, y = queue.popleft()
+            d = dist[(x, y)] + 1
+            if radius is not None and d > radius:
+                continue
+            for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                if (nx, ny) not in dist and 0 <= nx < width and 0 <= ny < height and tile(nx, ny) == TILE_FLOOR:
+                    dist[(nx, ny)] = d
+                    queue.append((nx, ny))
+        self.key, self.dist = key, dist
+        self.rebuilds += 1
+        return dist
 
 # --- Map Generation ---
 class Rect:
@@ -174,39 +630,175 @@ class Rect:
         return (self.x1 <= other.x2 and self.x2 >= other.x1 and
                 self.y1 <= other.y2 and self.y2 >= other.y1)
 
+class RoomGrid:
+    # Uniform grid over placed rooms. A room is filed under every cell its
+    # bounds touch, so overlap checks only look at rooms in those cells.
+    def __init__(self, cell_size=ROOM_MAX_SIZE + 2):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cells_for(self, rect):
+        size = self.cell_size
+        for cx in range(rect.x1 // size, rect.x2 // size + 1):
+            for cy in range(rect.y1 // size, rect.y2 // size + 1):
+                yield (cx, cy)
+
+    def add(self, rect):
+        for key in self.cells_for(rect):
+            self.cells.setdefault(key, []).append(rect)
+
+    def intersects(self, rect):
+        for key in self.cells_for(rect):
+            for other in self.cells.get(key, ()):
+                if rect.intersects(other):
+                    return True
+        return False
+
+class FloorBits:
+    # The walkable tiles of a level as one big int, a bit per tile row after
+    # row, with a spare zero bit closing each row so fills never wrap onto
+    # the next one. A flood fill step covers whole runs of floor in all four
+    # directions with a handful of shifts, so the number of steps follows
+    # the turns a path takes rather than its length, and the work per step
+    # is done by int arithmetic in C rather than per tile.
+    def __init__(self, tiles, width, height):
+        self.stride = width + 1
+        digits = tiles.translate(WALKABLE_DIGITS)
+        rows = b"0".join(digits[y * width:(y + 1) * width] for y in range(height))
+        self.floor = int(rows[::-1] or b"0", 2)  # int() reads the highest bit first
+        # Occluded fills towards lower bits (left, up) and higher bits (down)
+        self.left = self.propagators(1, width, lambda bits, n: bits >> n)
+        self.up = self.propagators(self.stride, height, lambda bits, n: bits >> n)
+        self.down = self.propagators(self.stride, height, lambda bits, n: bits << n)
+
+    def propagators(self, step, span, shift):
+        # (shift, tiles that lead on for that many steps), doubling each time
+        # until no run of floor is that long
+        levels, runs, n = [], self.floor, step
+        while n < step * span and runs:
+            levels.append((n, runs, shift))
+            runs &= shift(runs, n)
+            n *= 2
+        return levels
+
+    def bit(self, x, y):
+        return 1 << (y * self.stride + x)
+
+    def fill(self, reached):
+        floor = self.floor
+        reached &= floor
+        while True:
+            before = reached
+            # Adding floor carries each reached bit to the right end of its run
+            reached = ((floor + reached) ^ floor | reached) & floor
+            for levels in (self.left, self.up, self.down):
+                for n, runs, shift in levels:
+                    reached |= runs & shift(reached, n)
+            # A connected level is done without a step that finds nothing new
+            if reached == floor or reached == before:
+                return reached
+
+    def position(self, bits):
+        # Any one tile of a non-empty set
+        y, x = divmod((bits & -bits).bit_length() - 1, self.stride)
+        return x, y
+
 class Dungeon:
-    def __init__(self, width, height, level):
+    def __init__(self, width, height, level, seed=None, max_rooms=MAX_ROOMS, goal=True):
         self.width = width
         self.height = height
         self.level = level
-        self.grid = [[UI["wall"] for _ in range(width)] for _ in range(height)]
+        self.max_rooms = max_rooms
+        self.seed = seed
+        self.serial = next(LEVEL_SERIALS)
+        self.goal = goal  # whether generate() places the stairs or the boss
+        self.rng = random.Random(seed)
+        self.tiles = bytearray(width * height)  # row-major, all TILE_WALL
         self.rooms = []
-        self.items = []
+        self.room_grid = RoomGrid()
+        self.items = ItemTable()
         self.enemies = []
         self.stairs_down = None
+        # Tile -> occupants, kept in sync with the lists above
+        self.item_index = PositionIndex()
+        self.enemy_index = PositionIndex()
+        self.player_index = PositionIndex()
+        self.moves = 0  # bumped whenever an enemy changes tile
+
+    def add_enemy(self, enemy):
+        self.enemies.append(enemy)
+        self.enemy_index.add(enemy, enemy.x, enemy.y)
+
+    def move_enemy(self, enemy, x, y):
+        self.enemy_index.move(enemy, x, y)
+        self.moves += 1
+        return True
+
+    def remove_enemy(self, enemy):
+        if enemy in self.enemies:
+            self.enemies.remove(enemy)
+        self.enemy_index.remove(enemy, enemy.x, enemy.y)
+
+    def add_item(self, template_id, x, y, row=None):
+        row = self.items.add(template_id, x, y, row)
+        self.item_index.add(row, x, y)
+        return row
+
+    def remove_item(self, row, x, y):
+        self.items.remove(row)
+        self.item_index.remove(row, x, y)
+
+    def place_player(self, player, x, y):
+        self.player_index.move(player, x, y)
+
+    def enemies_at(self, x, y):
+        return self.enemy_index.at(x, y)
+
+    def items_at(self, x, y):
+        return self.item_index.at(x, y)
+
+    def players_at(self, x, y):
+        return self.player_index.at(x, y)
+
+    def start_position(self):
+        return self.rooms[0].center()
+
+    def tile(self, x, y):
+        return self.tiles[y * self.width + x]
+
+    def set_tile(self, x, y, tile):
+        self.tiles[y * self.width + x] = tile
+
+    def row_icons(self, y, x0=0, x1=None):
+        start = y * self.width
+        end = start + (self.width if x1 is None else x1)
+        return [TILE_ICONS[t] for t in self.tiles[start + x0:end]]
 
     def create_room(self, room):
-        for x in range(room.x1 + 1, room.x2):
-            for y in range(room.y1 + 1, room.y2):
-                self.grid[y][x] = UI["floor"]
+        floor = bytes((TILE_FLOOR,)) * (room.x2 - room.x1 - 1)
+        for y in range(room.y1 + 1, room.y2):
+            start = y * self.width + room.x1 + 1
+            self.tiles[start:start + len(floor)] = floor
 
     def create_h_tunnel(self, x1, x2, y):
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.grid[y][x] = UI["floor"]
+        x1, x2 = min(x1, x2), max(x1, x2)
+        start = y * self.width
+        self.tiles[start + x1:start + x2 + 1] = bytes((TILE_FLOOR,)) * (x2 - x1 + 1)
 
     def create_v_tunnel(self, y1, y2, x):
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.grid[y][x] = UI["floor"]
+        y1, y2 = min(y1, y2), max(y1, y2)
+        w = self.width
+        self.tiles[y1 * w + x:y2 * w + x + 1:w] = bytes((TILE_FLOOR,)) * (y2 - y1 + 1)
 
     def generate(self):
-        for _ in range(MAX_ROOMS):
-            w = random.randint(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
-            h = random.randint(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
-            x = random.randint(0, self.width - w - 1)
-            y = random.randint(0, self.height - h - 1)
+        for _ in range(self.max_rooms):
+            w = self.rng.randint(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+            h = self.rng.randint(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+            x = self.rng.randint(0, self.width - w - 1)
+            y = self.rng.randint(0, self.height - h - 1)
 
             new_room = Rect(x, y, w, h)
-            if any(new_room.intersects(other_room) for other_room in self.rooms):
+            if self.room_grid.intersects(new_room):
                 continue
 
             self.create_room(new_room)
@@ -214,7 +806,7 @@ class Dungeon:
 
             if self.rooms:
                 (prev_x, prev_y) = self.rooms[-1].center()
-                if random.randint(0, 1) == 1:
+                if self.rng.randint(0, 1) == 1:
                     self.create_h_tunnel(prev_x, new_x, prev_y)
                     self.create_v_tunnel(prev_y, new_y, new_x)
                 else:
@@ -223,176 +815,921 @@ class Dungeon:
             
             self.place_content(new_room)
             self.rooms.append(new_room)
+            self.room_grid.add(new_room)
+
+        if not self.rooms:
+            # No placement attempts were made: an empty room in the middle
+            w, h = min(ROOM_MIN_SIZE, self.width - 1), min(ROOM_MIN_SIZE, self.height - 1)
+            room = Rect((self.width - w) // 2, (self.height - h) // 2, w, h)
+            self.create_room(room)
+            self.rooms.append(room)
+            self.room_grid.add(room)
         
-        # Place stairs
-        if self.level < MAX_DUNGEON_LEVEL:
+        # Place stairs, unless another chunk of a world level holds them
+        if self.goal and self.level < MAX_DUNGEON_LEVEL:
             last_room = self.rooms[-1]
             self.stairs_down = last_room.center()
-            self.grid[self.stairs_down[1]][self.stairs_down[0]] = UI["stairs"]
-        else: # Boss level
+            self.set_tile(self.stairs_down[0], self.stairs_down[1], TILE_STAIRS)
+        elif self.goal: # Boss level
             boss_room = self.rooms[-1]
             boss_x, boss_y = boss_room.center()
-            self.enemies.append(Enemy(boss_x, boss_y, "dragon"))
+            self.add_enemy(Enemy(boss_x, boss_y, BOSS_ENEMY))
+        self.connect()
+
+    def connect(self):
+        # Checks that every walkable tile, the stairs and the boss included,
+        # can be reached from the start, and joins any region that cannot to
+        # the nearest reachable room with a tunnel. Returns the tunnels dug.
+        tunnels = 0
+        bits = FloorBits(self.tiles, self.width, self.height)
+        reached = bits.fill(bits.bit(*self.start_position()))
+        while reached != bits.floor:
+            x, y = bits.position(bits.floor ^ reached)
+            target_x, target_y = min((room.center() for room in self.rooms
+                                      if reached & bits.bit(*room.center())),
+                                     key=lambda c: abs(c[0] - x) + abs(c[1] - y))
+            self.create_h_tunnel(x, target_x, y)
+            self.create_v_tunnel(y, target_y, target_x)
+            tunnels += 1
+            bits = FloorBits(self.tiles, self.width, self.height)
+            reached = bits.fill(reached | bits.bit(x, y))
+        return tunnels
 
     def place_content(self, room):
         # Place enemies
-        num_enemies = random.randint(0, 3)
+        num_enemies = self.rng.randint(0, 3)
         for _ in range(num_enemies):
-            x = random.randint(room.x1 + 1, room.x2 - 1)
-            y = random.randint(room.y1 + 1, room.y2 - 1)
-            if not any(e.x == x and e.y == y for e in self.enemies):
-                enemy_type = random.choice(list(ENEMIES.keys() - {'dragon'}))
-                self.enemies.append(Enemy(x, y, enemy_type))
+            x = self.rng.randint(room.x1 + 1, room.x2 - 1)
+            y = self.rng.randint(room.y1 + 1, room.y2 - 1)
+            if not self.enemy_index.at(x, y):
+                enemy_type = self.rng.choice(SPAWNABLE_ENEMIES)
+                self.add_enemy(Enemy(x, y, enemy_type))
         
         # Place items
-        num_items = random.randint(0, 2)
+        num_items = self.rng.randint(0, 2)
         for _ in range(num_items):
-            x = random.randint(room.x1 + 1, room.x2 - 1)
-            y = random.randint(room.y1 + 1, room.y2 - 1)
-            if not any(i.x == x and i.y == y for i in self.items):
-                item_choice = random.random()
+            x = self.rng.randint(room.x1 + 1, room.x2 - 1)
+            y = self.rng.randint(room.y1 + 1, room.y2 - 1)
+            if not self.item_index.at(x, y):
+                item_choice = self.rng.random()
                 if item_choice < 0.4:
-                    item = Potion("Health Potion", 20)
+                    item = HEALTH_POTION
                 elif item_choice < 0.7:
-                    item = random.choice(WEAPONS)
+                    item = self.rng.choice(WEAPONS)
                 else:
-                    item = random.choice(ARMOR)
-                item.x = x
-                item.y = y
-                self.items.append(item)
+                    item = self.rng.choice(ARMOR)
+                self.add_item(item.id, x, y)
+
+
+# --- Chunked World ---
+class Chunk:
+    def __init__(self, tiles, hub, enemies, items, removed):
+        self.tiles = tiles
+        self.hub = hub  # centre of the first room, where the doorway tunnels meet
+        self.enemies = enemies
+        self.items = items  # item table row -> spawn index
+        self.removed = removed  # spawn keys of enemies killed and items taken
+
+class ChunkedDungeon:
+    # An endless level split into CHUNK_SIZE squares. Each chunk is generated
+    # from its coordinates when a hero comes near it, and joined to its four
+    # neighbours through doorways whose position depends only on the shared
+    # edge. At most max_chunks stay loaded; an evicted chunk is rebuilt from
+    # its seed, so all that survives eviction is the set of spawns removed
+    # from it, kept in memory or written to spill_dir.
+    def __init__(self, level, seed, max_chunks=MAX_LOADED_CHUNKS, spill_dir=None):
+        self.level = level
+        self.seed = seed
+        self.serial = next(LEVEL_SERIALS)
+        self.max_chunks = max_chunks
+        self.spill_dir = spill_dir
+        self.width = self.height = WORLD_CHUNKS * CHUNK_SIZE
+        # Only one chunk per level gets the stairs, or the boss on the last level
+        origin = WORLD_CHUNKS // 2
+        offsets = [(dx, dy) for dx in range(-GOAL_RANGE, GOAL_RANGE + 1)
+                   for dy in range(-GOAL_RANGE, GOAL_RANGE + 1) if (dx, dy) != (0, 0)]
+        dx, dy = offsets[derive_seed(seed, "goal") % len(offsets)]
+        self.goal_chunk = (origin + dx, origin + dy)
+        self.chunks = OrderedDict()
+        self.evicted = {}
+        self.stairs_down = None
+        self.items = ItemTable()  # drops in every loaded chunk
+        self.item_index = PositionIndex()
+        self.enemy_index = PositionIndex()
+        self.player_index = PositionIndex()
+        self.moves = 0
+
+    @property
+    def enemies(self):
+        return [e for chunk in self.chunks.values() for e in chunk.enemies]
+
+    def generate(self):
+        self.load_around(*self.start_position())
+
+    def start_position(self):
+        origin = WORLD_CHUNKS // 2
+        return self.chunk(origin, origin).hub
+
+    def doorway(self, axis, cx, cy):
+        # Offset along the edge on the low side of chunk (cx, cy)
+        return 1 + derive_seed(self.seed, "door", axis, cx, cy) % (CHUNK_SIZE - 2)
+
+    def build_chunk(self, cx, cy):
+        d = Dungeon(CHUNK_SIZE, CHUNK_SIZE, self.level, derive_seed(self.seed, "chunk", cx, cy), CHUNK_ROOMS,
+                    goal=(cx, cy) == self.goal_chunk)
+        d.generate()
+        hub_x, hub_y = d.rooms[0].center()
+        last = CHUNK_SIZE - 1
+        for row, edge_x in ((self.doorway("x", cx, cy), 0), (self.doorway("x", cx + 1, cy), last)):
+            d.create_v_tunnel(hub_y, row, hub_x)
+            d.create_h_tunnel(hub_x, edge_x, row)
+        for col, edge_y in ((self.doorway("y", cx, cy), 0), (self.doorway("y", cx, cy + 1), last)):
+            d.create_h_tunnel(hub_x, col, hub_y)
+            d.create_v_tunnel(hub_y, edge_y, col)
+        if d.stairs_down:
+            d.set_tile(d.stairs_down[0], d.stairs_down[1], TILE_STAIRS)
+        return d
+
+    def chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is not None:
+            self.chunks.move_to_end((cx, cy))
+            return chunk
+        d = self.build_chunk(cx, cy)
+        removed = self.load_removed(cx, cy)
+        ox, oy = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        enemies, items = [], {}
+        for i, enemy in enumerate(d.enemies):
+            if ("enemy", i) not in removed:
+                enemy.x, enemy.y, enemy.spawn_id = enemy.x + ox, enemy.y + oy, ("enemy", i)
+                enemies.append(enemy)
+                self.enemy_index.add(enemy, enemy.x, enemy.y)
+        for i, row in enumerate(d.items):
+            if ("item", i) not in removed:
+                x, y = d.items.x[row] + ox, d.items.y[row] + oy
+                items[self.add_item(d.items.template[row], x, y)] = i
+        hub_x, hub_y = d.rooms[0].center()
+        if d.stairs_down:
+            self.stairs_down = (ox + d.stairs_down[0], oy + d.stairs_down[1])
+        chunk = self.chunks[(cx, cy)] = Chunk(d.tiles, (ox + hub_x, oy + hub_y), enemies, items, removed)
+        self.evict()
+        return chunk
+
+    def spill_path(self, cx, cy):
+        return os.path.join(self.spill_dir, f"level{self.level}_{cx}_{cy}.json")
+
+    def load_removed(self, cx, cy):
+        if (cx, cy) in self.evicted:
+            return self.evicted.pop((cx, cy))
+        if self.spill_dir and os.path.exists(self.spill_path(cx, cy)):
+            with open(self.spill_path(cx, cy)) as f:
+                return {tuple(key) for key in json.load(f)}
+        return set()
+
+    def pinned(self):
+        return {(x // CHUNK_SIZE + dx, y // CHUNK_SIZE + dy)
+                for x, y in self.player_index.cells
+                for dx in range(-LOAD_RADIUS, LOAD_RADIUS + 1)
+                for dy in range(-LOAD_RADIUS, LOAD_RADIUS + 1)}
+
+    def evict(self):
+        if len(self.chunks) <= self.max_chunks:
+            return
+        pinned = self.pinned()
+        for key in list(self.chunks):
+            if len(self.chunks) <= self.max_chunks:
+                break
+            if key in pinned:
+                continue
+            chunk = self.chunks.pop(key)
+            for enemy in chunk.enemies:
+                self.enemy_index.remove(enemy, enemy.x, enemy.y)
+            for row in chunk.items:
+                self.item_index.remove(row, self.items.x[row], self.items.y[row])
+                self.items.remove(row)
+            if not chunk.removed:
+                continue
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                with open(self.spill_path(*key), 'w') as f:
+                    json.dump(sorted(chunk.removed), f)
+            else:
+                self.evicted[key] = chunk.removed
+
+    def load_around(self, x, y):
+        cx, cy = x // CHUNK_SIZE, y // CHUNK_SIZE
+        for dy in range(-LOAD_RADIUS, LOAD_RADIUS + 1):
+            for dx in range(-LOAD_RADIUS, LOAD_RADIUS + 1):
+                self.chunk(cx + dx, cy + dy)
+
+    def chunk_at(self, x, y):
+        return self.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+
+    def tile(self, x, y):
+        return self.chunk_at(x, y).tiles[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def row_icons(self, y, x0=0, x1=None):
+        x1 = self.width if x1 is None else x1
+        row = []
+        while x0 < x1:
+            end = min(x1, (x0 // CHUNK_SIZE + 1) * CHUNK_SIZE)
+            start = (y % CHUNK_SIZE) * CHUNK_SIZE + x0 % CHUNK_SIZE
+            row.extend(TILE_ICONS[t] for t in self.chunk_at(x0, y).tiles[start:start + end - x0])
+            x0 = end
+        return row
+
+    def move_enemy(self, enemy, x, y):
+        # Enemies stay in their home chunk, which rebuilds them on reload
+        if (x // CHUNK_SIZE, y // CHUNK_SIZE) != (enemy.x // CHUNK_SIZE, enemy.y // CHUNK_SIZE):
+            return False
+        self.enemy_index.move(enemy, x, y)
+        self.moves += 1
+        return True
+
+    def remove_enemy(self, enemy):
+        chunk = self.chunk_at(enemy.x, enemy.y)
+        if enemy in chunk.enemies:
+            chunk.enemies.remove(enemy)
+            chunk.removed.add(enemy.spawn_id)
+        self.enemy_index.remove(enemy, enemy.x, enemy.y)
+
+    def add_item(self, template_id, x, y):
+        row = self.items.add(template_id, x, y)
+        self.item_index.add(row, x, y)
+        return row
+
+    def remove_item(self, row, x, y):
+        chunk = self.chunk_at(x, y)
+        spawn = chunk.items.pop(row, None)
+        if spawn is not None:
+            chunk.removed.add(("item", spawn))
+        self.items.remove(row)
+        self.item_index.remove(row, x, y)
+
+    def place_player(self, player, x, y):
+        self.player_index.move(player, x, y)
+        self.load_around(x, y)
+
+    def enemies_at(self, x, y):
+        return self.enemy_index.at(x, y)
+
+    def items_at(self, x, y):
+        return self.item_index.at(x, y)
+
+    def players_at(self, x, y):
+        return self.player_index.at(x, y)
+
+# --- Rendering ---
+CSI = "\x1b["
+MAP_CELL_WIDTH = 2  # emoji tiles occupy two terminal columns
+PROMPT_MARGIN = 12  # rows kept free below the frame for menus and prompts
+
+class TerminalRenderer:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.last_frame = None
+        # While deferred, frames and the text below them wait for present(),
+        # so a burst of turns costs a single redraw
+        self.deferred = False
+        self.pending = None
+        self.notes = []
+
+    def invalidate(self):
+        self.last_frame = None
 
+    def clear(self):
+        self.stream.write(f"{CSI}2J{CSI}H")
+        self.stream.flush()
+        self.last_frame = None
+
+    def fits_terminal(self, height):
+        rows = shutil.get_terminal_size(fallback=(80, 0)).lines
+        return rows == 0 or height + PROMPT_MARGIN <= rows
+
+    def echo(self, text):
+        if self.deferred:
+            self.notes.append(text)
+        else:
+            self.stream.write(text)
+
+    def dirty(self):
+        return self.pending is not None or bool(self.notes)
+
+    def present(self):
+        if self.pending is not None:
+            self.stream.write(self.frame(self.pending))
+            self.last_frame, self.pending = self.pending, None
+        self.stream.write("".join(self.notes))
+        self.notes = []
+        self.stream.flush()
+
+    def draw(self, lines):
+        if self.deferred:
+            # Text under the old frame is wiped when the new one is drawn
+            self.pending, self.notes = lines, []
+            return
+        self.stream.write(self.frame(lines))
+        self.stream.flush()
+        self.last_frame = lines
+
+    def frame(self, lines):
+        # A line is either plain text or a list of map cells. Only the cells
+        # and lines that differ from the previous frame are rewritten.
+        last = self.last_frame
+        out = []
+        if last is None or len(last) != len(lines) or not self.fits_terminal(len(lines)):
+            out.append(f"{CSI}2J{CSI}H")
+            for line in lines:
+                out.append(line if isinstance(line, str) else "".join(line))
+                out.append("\n")
+        else:
+            for y, line in enumerate(lines):
+                old = last[y]
+                if line == old:
+                    continue
+                if isinstance(line, str) or isinstance(old, str) or len(line) != len(old):
+                    text = line if isinstance(line, str) else "".join(line)
+                    out.append(f"{CSI}{y + 1};1H{text}{CSI}K")
+                    continue
+                x, width = 0, len(line)
+                while x < width:
+                    if line[x] == old[x]:
+                        x += 1
+                        continue
+                    start = x
+                    while x < width and line[x] != old[x]:
+                        x += 1
+                    out.append(f"{CSI}{y + 1};{start * MAP_CELL_WIDTH + 1}H{''.join(line[start:x])}")
+            # Park the cursor under the frame and wipe the previous prompts
+            out.append(f"{CSI}{len(lines) + 1};1H{CSI}J")
+        return "".join(out)
+
+# --- Keyboard ---
+ARROW_KEYS = {f"{CSI}A": "w", f"{CSI}B": "s", f"{CSI}C": "d", f"{CSI}D": "a"}
+ESCAPE_SEQUENCE = re.compile(r"\x1b\[[0-9;]*[A-Za-z~]|\x1b.?")
+LINE_KEYS = "\r\n\x7f\b"  # enter and backspace, for answers longer than a key
+# A stray key would cost a turn, e.g. a held movement key running into a
+# fight, so keys a prompt can't use are ignored
+PROMPT_KEYS = {"turn": "wasdiq", "combat": "123", "inventory": "uec"}
+
+class RawKeyboard:
+    # cbreak mode: keys arrive as they are pressed, unechoed, while Ctrl-C
+    # still interrupts. Everything already typed is read in one go.
+    def __init__(self, stream=None):
+        self.fd = (stream or sys.stdin).fileno()
+        self.saved = None
+
+    def __enter__(self):
+        self.saved = termios.tcgetattr(self.fd)
+        tty.setcbreak(self.fd)
+        return self
+
+    def __exit__(self, *exc):
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+        return False
+
+    def read(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        text = os.read(self.fd, 4096).decode(errors="ignore")
+        for sequence, key in ARROW_KEYS.items():
+            text = text.replace(sequence, key)
+        text = ESCAPE_SEQUENCE.sub("", text)
+        return [key for key in text if key in LINE_KEYS or (key.isprintable() and not key.isspace())]
+
+# --- Decisions ---
+# The game never calls input() itself. Every decision is yielded as a Prompt
+# from the play() generator and the answer is sent back in, so the same rules
+# can be driven by a human at the terminal or by a policy object.
+class Prompt:
+    def __init__(self, kind, text, player=None, options=None):
+        self.kind = kind
+        self.text = text
+        self.player = player
+        self.options = options
+
+# --- Events ---
+# The game publishes what happens as (number, turn, kind, args) tuples. Text
+# is only made from an event when the message panel shows it, and
+# subscribers are handed everything new in batches between turns.
+EVENT_BUFFER = 256  # recent events kept for the panel and for subscribers
+MESSAGE_LINES = 5  # events shown in the message panel
+
+DAMAGE_TEXT = {
+    None: "{attacker} hits {target} for {amount} damage.",
+    "Power Strike": "{attacker} uses Power Strike on {target} for {amount} damage!",
+    "Fireball": "Fireball hits {target} for {amount} damage.",
+    "Double Shot": "{attacker} shoots {target} for {amount} damage.",
+}
+
+EVENT_TEXT = {
+    "text": lambda text: text,
+    "level_enter": lambda level: f"You have entered dungeon level {level}.",
+    "ambush": lambda names: f"{', '.join(names)} attack{'s' if len(names) == 1 else ''} the party!",
+    "blocked": lambda edge: "You can't move off the map." if edge else "You can't move there.",
+    "pickup": lambda hero, item: f"{hero} picked up a {item}.",
+    "potion": lambda hero, potion, hp: f"{hero} used {potion} and gained {hp} HP.",
+    "no_potions": lambda: "You have no potions to use.",
+    "equip": lambda hero, item: f"{hero} equipped {item}.",
+    "nothing_to_equip": lambda: "You have nothing to equip.",
+    "invalid": lambda: "Invalid choice.",
+    "combat": lambda: "You've entered combat!",
+    "skill": lambda hero, skill: f"{hero} {'casts' if skill == 'Fireball' else 'uses'} {skill}!",
+    "cooldown": lambda skill, turns: f"{skill} is on cooldown for {turns} more turns.",
+    "no_mana": lambda skill: f"Not enough mana for {skill}.",
+    "damage": lambda attacker, target, amount, skill: DAMAGE_TEXT[skill].format(
+        attacker=attacker, target=target, amount=amount),
+    "battle_won": lambda: "You won the battle!",
+    "victory": lambda boss: f"Congratulations! You have defeated the {boss} and won the game!",
+    "defeat": lambda: "Your party has been defeated. Game Over.",
+    "level_up": lambda hero, level: f"{hero} leveled up to level {level}! Stats increased.",
+}
+
+def event_text(event):
+    _, _, kind, args = event
+    return EVENT_TEXT[kind](*args)
+
+class EventBus:
+    def __init__(self, size=EVENT_BUFFER):
+        self.events = deque(maxlen=size)
+        self.published = 0  # events ever published, which numbers the next one
+        self.subscribers = []  # [subscriber, number of the first event it has not seen]
+        self.texts = {}  # event number -> text, for the events on the panel
+
+    def publish(self, turn, kind, *args):
+        self.events.append((self.published, turn, kind, args))
+        self.published += 1
+        # Deliver early rather than let the ring buffer drop unseen events
+        if self.subscribers and self.published - self.subscribers[0][1] >= self.events.maxlen:
+            self.flush()
+
+    def subscribe(self, subscriber):
+        # Subscribers get handle(events) with everything published since
+        # they subscribed, oldest first
+        self.subscribers.append([subscriber, self.published])
+
+    def flush(self):
+        for entry in self.subscribers:
+            subscriber, seen = entry
+            if seen < self.published:
+                skip = max(0, len(self.events) - (self.published - seen))
+                subscriber.handle(list(islice(self.events, skip, None)))
+                entry[1] = self.published
+
+    def close(self):
+        self.flush()
+        for subscriber, _ in self.subscribers:
+            close = getattr(subscriber, "close", None)
+            if close:
+                close()
+
+    def messages(self, count=MESSAGE_LINES):
+        # The panel text, formatting each event the first time it is shown
+        recent = list(islice(reversed(self.events), count))[::-1]
+        texts = self.texts
+        lines = []
+        for event in recent:
+            text = texts.get(event[0])
+            if text is None:
+                text = texts[event[0]] = event_text(event)
+            lines.append(text)
+        if len(texts) > 4 * count:
+            oldest = recent[0][0]
+            self.texts = {number: text for number, text in texts.items() if number >= oldest}
+        return lines
+
+class EventSink:
+    # Writes every event as one JSON line, for tools outside the game
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def handle(self, events):
+        self.file.write("".join(json.dumps({"n": n, "turn": turn, "kind": kind, "args": args}) + "\n"
+                                for n, turn, kind, args in events))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class EventStats:
+    # Counts events by kind and totals damage dealt and taken by name
+    def __init__(self):
+        self.kinds = Counter()
+        self.dealt = Counter()
+        self.taken = Counter()
+
+    def handle(self, events):
+        for _, _, kind, args in events:
+            self.kinds[kind] += 1
+            if kind == "damage":
+                attacker, target, amount, _ = args
+                self.dealt[attacker] += amount
+                self.taken[target] += amount
+
+    def report(self):
+        return {"events": dict(self.kinds), "damage_dealt": dict(self.dealt), "damage_taken": dict(self.taken)}
+
+# --- Highscores ---
+# Every finished run is kept in SQLite. WAL mode lets sessions read while
+# another writes, each write is its own transaction, and the indexes answer
+# top-N and per-party queries without scanning the whole history.
+HIGHSCORE_SCHEMA = """
+CREATE TABLE runs (
+    id INTEGER PRIMARY KEY,
+    party TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    seed TEXT,
+    turns INTEGER,
+    won INTEGER NOT NULL DEFAULT 0,
+    killed_by TEXT,
+    recorded_at REAL
+);
+CREATE INDEX runs_by_score ON runs (level DESC, xp DESC);
+CREATE INDEX runs_by_party ON runs (party, level DESC, xp DESC);
+"""
+
+class HighscoreStore:
+    def __init__(self, path=HIGHSCORE_DB, legacy_file=HIGHSCORE_FILE):
+        self.db = sqlite3.connect(path, timeout=HIGHSCORE_TIMEOUT, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # With WAL this only skips the fsync per commit, not crash safety
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.migrate(legacy_file)
+
+    def migrate(self, legacy_file):
+        # Exclusive so two sessions starting at once don't both import
+        with self.transaction():
+            if self.db.execute("PRAGMA user_version").fetchone()[0] >= 1:
+                return
+            # executescript() would commit first, so run the statements one by one
+            for statement in HIGHSCORE_SCHEMA.split(";"):
+                if statement.strip():
+                    self.db.execute(statement)
+            scores = []
+            if legacy_file and os.path.exists(legacy_file):
+                try:
+                    with open(legacy_file, 'r') as f:
+                        scores = json.load(f)
+                except json.JSONDecodeError:
+                    scores = []
+            self.db.executemany("INSERT INTO runs (party, level, xp) VALUES (?, ?, ?)",
+                                [(s["party"], s["level"], s["xp"]) for s in scores])
+            self.db.execute("PRAGMA user_version = 1")
+
+    def transaction(self):
+        return HighscoreTransaction(self.db)
+
+    def record(self, party, level, xp, seed=None, turns=None, won=False, killed_by=None):
+        with self.transaction():
+            self.db.execute(
+                "INSERT INTO runs (party, level, xp, seed, turns, won, killed_by, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (party, level, xp, None if seed is None else str(seed), turns, int(won), killed_by, time.time()))
+
+    def top(self, n=10):
+        return self.query("SELECT party, level, xp FROM runs ORDER BY level DESC, xp DESC LIMIT ?", (n,))
+
+    def party_runs(self, party, n=10):
+        return self.query("SELECT party, level, xp FROM runs WHERE party = ?"
+                          " ORDER BY level DESC, xp DESC LIMIT ?", (party, n))
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def query(self, sql, params):
+        return [{"party": party, "level": level, "xp": xp}
+                for party, level, xp in self.db.execute(sql, params)]
+
+    def close(self):
+        self.db.close()
+
+class HighscoreTransaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so a busy database is
+    # waited on for HIGHSCORE_TIMEOUT instead of failing halfway through
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
 
 # --- Game ---
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, seed=None, pregenerate=None,
+                 width=MAP_WIDTH, height=MAP_HEIGHT, max_rooms=MAX_ROOMS,
+                 world=False, chunk_budget=MAX_LOADED_CHUNKS, spill_dir=None, enemy_ai=True,
+                 save_path=None):
+        self.map_size = (width, height, max_rooms)
+        self.world = (chunk_budget, spill_dir) if world else None
+        self.seed = new_run_seed() if seed is None else seed
+        self.rng = random.Random(derive_seed(self.seed, "game"))
         self.players = []
         self.dungeon = None
         self.current_player_idx = 0
         self.game_over = False
         self.dungeon_level = 1
-        self.messages = deque(maxlen=5)
+        self.events = EventBus()
+        self.renderer = None if headless else TerminalRenderer()
+        self.turns = 0
+        self.won = False
+        self.quit = False
+        self.killed_by = None
+        self.damage_log = None  # set to a list to record (attacker, target, damage)
+        # Level N+1 is built on a worker thread while level N is played
+        self.pregenerate = not headless if pregenerate is None else pregenerate
+        self.generator = None
+        self.next_level = None  # (level, Future)
+        self.chase_map = DistanceMap() if enemy_ai else None
+        self.save_file = SaveFile(save_path) if save_path else None  # autosaved every turn
+        self.highscore_db = HIGHSCORE_DB
 
     def clear_screen(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if self.renderer:
+            self.renderer.clear()
+
+    def echo(self, text=""):
+        if self.renderer:
+            self.renderer.echo(text + "\n")
+
+    def play(self):
+        yield from self.setup_game()
+        yield from self.main_loop()
+
+    def resume(self):
+        # Picks a loaded game up at the start of the turn it was saved on
+        self.pregenerate_level(self.dungeon_level + 1)
+        yield from self.main_loop()
+
+    def run(self, policy=None, session=None):
+        if session is None:
+            session = self.play()
+        try:
+            prompt = next(session)
+            while True:
+                answer = input(prompt.text) if policy is None else policy.decide(self, prompt)
+                prompt = session.send(answer)
+        except StopIteration:
+            pass
+        finally:
+            self.stop_pregeneration()
+            self.events.close()
+            if self.save_file:
+                self.save_file.close()
+
+    def run_realtime(self, fps=TARGET_FPS, session=None):
+        # Keys are answered as soon as they arrive, and the screen is redrawn
+        # at most fps times a second, so a held key walks the party without
+        # waiting on the display. Setup questions still take a typed line.
+        if session is None:
+            session = self.play()
+        renderer = self.renderer
+        try:
+            prompt = next(session)
+            while prompt.player is None:
+                prompt = session.send(input(prompt.text))
+            renderer.deferred = True
+            renderer.echo(prompt.text)
+            interval = 1.0 / fps
+            next_frame = 0.0
+            line = None  # digits typed so far, for menus with ten or more entries
+            with RawKeyboard() as keyboard:
+                while True:
+                    wait = max(0.0, next_frame - time.monotonic()) if renderer.dirty() else None
+                    for key in keyboard.read(wait):
+                        if line is not None:
+                            if key in "\r\n":
+                                prompt, line = session.send(line), None
+                                renderer.echo(prompt.text)
+                            elif key in "\x7f\b":
+                                line = line[:-1]
+                                renderer.echo("\b \b")
+                            else:
+                                line += key
+                                renderer.echo(key)
+                        elif key in LINE_KEYS or key.lower() not in PROMPT_KEYS.get(prompt.kind, key.lower()):
+                            continue
+                        elif prompt.options and len(prompt.options) > 9 and prompt.kind != "combat":
+                            line = key
+                            renderer.echo(key)
+                        else:
+                            prompt = session.send(key)
+                            renderer.echo(prompt.text)
+                    if renderer.dirty() and time.monotonic() >= next_frame:
+                        renderer.present()
+                        next_frame = time.monotonic() + interval
+        except StopIteration:
+            pass
+        finally:
+            renderer.deferred = False
+            renderer.present()
+            self.stop_pregeneration()
+            self.events.close()
+            if self.save_file:
+                self.save_file.close()
+
+    def publish(self, kind, *args):
+        self.events.publish(self.turns, kind, *args)
 
-    def add_message(self, msg):
-        self.messages.append(msg)
+    def deal_damage(self, attacker, target, damage):
+        target.take_damage(damage)
+        if self.damage_log is not None:
+            self.damage_log.append((attacker, target, damage))
+        if isinstance(target, Player) and not target.is_alive():
+            self.killed_by = attacker.name
 
     def print_game(self):
-        self.clear_screen()
-        # Draw map
-        print(f'--- Dungeon Level {self.dungeon_level} ---')
-        # Double check if the terminal is printing the emojis correctly
-        # For windows, we might need to set the encoding
-        if os.name == 'nt':
-            os.system('chcp 65001')
-
-        for y in range(self.dungeon.height):
-            row = []
-            for x in range(self.dungeon.width):
-                icon = self.dungeon.grid[y][x]
-                
-                # Check for items
-                item_on_tile = False
-                for item in self.dungeon.items:
-                    if item.x == x and item.y == y:
-                        icon = item.icon
-                        item_on_tile = True
-                        break
-                if item_on_tile:
-                    row.append(icon)
-                    continue
+        if self.renderer is None:
+            return
+        lines = [f'--- Dungeon Level {self.dungeon_level} --- Seed {self.seed}']
+        lines.extend(self.map_rows())
+        lines.extend(self.status_lines())
+        lines.append("")
+        lines.append("--- Messages ---")
+        # Pad the panel so the frame keeps a fixed height between redraws
+        messages = self.events.messages()
+        lines.extend(text.replace("\n", " ").strip() for text in messages)
+        lines.extend([""] * (MESSAGE_LINES - len(messages)))
+        self.renderer.draw(lines)
 
-                # Check for enemies
-                enemy_on_tile = False
-                for enemy in self.dungeon.enemies:
-                    if enemy.x == x and enemy.y == y:
-                        icon = enemy.icon
-                        enemy_on_tile = True
-                        break
-                if enemy_on_tile:
-                    row.append(icon)
-                    continue
-                
-                # Check for players
-                player_on_tile = False
-                for player in self.players:
-                    if player.x == x and player.y == y:
-                        icon = player.icon
-                        player_on_tile = True
-                        break
-                if player_on_tile:
-                    row.append(icon)
+    def view_origin(self):
+        # Keep the current hero centred, clamped to the map edges
+        d = self.dungeon
+        view_w, view_h = min(VIEW_WIDTH, d.width), min(VIEW_HEIGHT, d.height)
+        if not self.players:
+            return 0, 0, view_w, view_h
+        p = self.players[self.current_player_idx % len(self.players)]
+        x0 = max(0, min(p.x - view_w // 2, d.width - view_w))
+        y0 = max(0, min(p.y - view_h // 2, d.height - view_h))
+        return x0, y0, view_w, view_h
+
+    def map_rows(self):
+        # Bare tiles with occupants looked up per tile in the position index;
+        # items win over enemies, enemies over players.
+        d = self.dungeon
+        x0, y0, view_w, view_h = self.view_origin()
+        items, enemies, players = d.item_index.cells, d.enemy_index.cells, d.player_index.cells
+        table = d.items
+        rows = []
+        for y in range(y0, y0 + view_h):
+            row = d.row_icons(y, x0, x0 + view_w)
+            for x in range(x0, x0 + view_w):
+                drops = items.get((x, y))
+                if drops:
+                    row[x - x0] = table[drops[0]].icon
                     continue
-                
-                row.append(icon)
-            print("".join(row))
-        
-        # Print status
-        self.print_status()
-        # Print messages
-        print("\n--- Messages ---")
-        for msg in self.messages:
-            print(msg)
-
-    def print_status(self):
-        print("\n--- Party ---")
+                occupants = enemies.get((x, y)) or players.get((x, y))
+                if occupants:
+                    row[x - x0] = occupants[0].icon
+            rows.append(row)
+        return rows
+
+    def status_lines(self):
+        lines = ["", "--- Party ---"]
         for p in self.players:
             weapon_name = p.weapon.name if p.weapon else "None"
             armor_name = p.armor.name if p.armor else "None"
             mana_str = f'| {UI["mana"]} {p.mana}/{p.max_mana}' if p.max_mana > 0 else ""
-            print(f'{p.icon} {p.name} ({p.char_class}) | {UI["level"]} {p.level} | {UI["hp"]} {p.hp}/{p.max_hp} {mana_str} | {UI["xp"]} {p.xp}/{p.level*100} | {UI["attack"]} {p.attack} | {UI["defense"]} {p.defense} | {UI["weapon"]} {weapon_name} | {UI["armor"]} {armor_name}')
+            lines.append(f'{p.icon} {p.name} ({p.char_class}) | {UI["level"]} {p.level} | {UI["hp"]} {p.hp}/{p.max_hp} {mana_str} | {UI["xp"]} {p.xp}/{p.level*100} | {UI["attack"]} {p.attack} | {UI["defense"]} {p.defense} | {UI["weapon"]} {weapon_name} | {UI["armor"]} {armor_name}')
+        return lines
 
     def setup_game(self):
         self.clear_screen()
         num_players = 0
         while not (1 <= num_players <= 3):
             try:
-                num_players = int(input("Enter number of heroes (1-3): "))
+                num_players = int((yield Prompt("party_size", "Enter number of heroes (1-3): ")))
                 if not (1 <= num_players <= 3):
-                    print("Please enter a number between 1 and 3.")
+                    self.echo("Please enter a number between 1 and 3.")
             except ValueError:
-                print("Invalid input. Please enter a number.")
+                self.echo("Invalid input. Please enter a number.")
 
         for i in range(num_players):
-            name = input(f"Enter name for hero {i+1}: ")
+            name = yield Prompt("hero_name", f"Enter name for hero {i+1}: ")
             class_choice = ""
             while class_choice not in CLASSES:
-                class_choice = input(f"Choose class for {name} (warrior, mage, archer): ").lower()
+                class_choice = (yield Prompt("hero_class", f"Choose class for {name} ({', '.join(CLASSES)}): ", options=list(CLASSES))).lower()
                 if class_choice not in CLASSES:
-                    print("Invalid class. Please choose from warrior, mage, or archer.")
+                    self.echo(f"Invalid class. Please choose from {', '.join(CLASSES)}.")
             self.players.append(Player(0, 0, name, class_choice))
         
         self.new_level()
 
+    def build_level(self, level):
+        if self.world:
+            dungeon = ChunkedDungeon(level, self.level_seed(level), *self.world)
+            dungeon.generate()
+            return dungeon
+        width, height, max_rooms = self.map_size
+        dungeon = Dungeon(width, height, level, self.level_seed(level), max_rooms)
+        dungeon.generate()
+        return dungeon
+
+    def take_pregenerated(self, level):
+        if self.next_level is None:
+            return None
+        pending_level, future = self.next_level
+        self.next_level = None
+        # A job that has not started is dropped and the level built here,
+        # which gives the identical level from the same seed. One that is
+        # running can't be stopped, so waiting for it is cheaper than
+        # generating the level a second time.
+        if future.cancel() or pending_level != level:
+            return None
+        return future.result()
+
+    def pregenerate_level(self, level):
+        if not self.pregenerate or level > MAX_DUNGEON_LEVEL:
+            return
+        if self.generator is None:
+            self.generator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-gen")
+        self.next_level = (level, self.generator.submit(self.build_level, level))
+
+    def stop_pregeneration(self):
+        if self.generator is not None:
+            self.generator.shutdown(wait=False, cancel_futures=True)
+            self.generator = None
+        self.next_level = None
+
     def new_level(self):
-        self.dungeon = Dungeon(MAP_WIDTH, MAP_HEIGHT, self.dungeon_level)
-        self.dungeon.generate()
-        start_room = self.dungeon.rooms[0]
+        self.dungeon = self.take_pregenerated(self.dungeon_level) or self.build_level(self.dungeon_level)
+        self.pregenerate_level(self.dungeon_level + 1)
+        start_x, start_y = self.dungeon.start_position()
         for player in self.players:
-            player.x, player.y = start_room.center()
-        self.add_message(f"You have entered dungeon level {self.dungeon_level}.")
+            self.dungeon.place_player(player, start_x, start_y)
+        self.publish("level_enter", self.dungeon_level)
+
+    def level_seed(self, level):
+        return derive_seed(self.seed, "level", level)
 
     def main_loop(self):
         while not self.game_over:
+            if self.events.subscribers:
+                self.events.flush()
+            if self.save_file:
+                self.save_file.autosave(self)
             self.print_game()
             player = self.players[self.current_player_idx]
             if player.skill_cooldown > 0:
                 player.skill_cooldown -= 1
 
-            action = input(f"\n{player.name}'s turn. Move (w/a/s/d), (i)nventory, or (q)uit: ").lower()
+            action = (yield Prompt("turn", f"\n{player.name}'s turn. Move (w/a/s/d), (i)nventory, or (q)uit: ", player)).lower()
+            self.turns += 1
 
             if action == 'q':
                 self.game_over = True
+                self.quit = True
                 continue
             
             if action in ['w', 'a', 's', 'd']:
-                self.move_player(player, action)
+                yield from self.move_player(player, action)
             elif action == 'i':
-                self.show_inventory(player)
+                yield from self.show_inventory(player)
 
             if not self.game_over:
                 self.current_player_idx = (self.current_player_idx + 1) % len(self.players)
+                if self.current_player_idx == 0 and self.chase_map:
+                    yield from self.enemy_turn()
+        # A finished run can't be resumed; a quit one keeps its last autosave
+        if self.save_file and not self.quit:
+            self.save_file.discard()
+
+    def move_enemies(self):
+        # Every enemy in range steps downhill on the shared distance map,
+        # nearest first so followers can take the tiles others leave. Those
+        # already next to a hero stay put and are returned as attackers.
+        sources = [(p.x, p.y) for p in self.players if p.is_alive()]
+        enemies, items = self.dungeon.enemy_index.cells, self.dungeon.item_index.cells
+        radius = self.chase_map.radius
+        # Walking distance is never shorter than Manhattan distance, so skip
+        # the search outright while nothing is close enough to chase
+        if radius is not None and not any(abs(ex - x) + abs(ey - y) <= radius
+                                           for ex, ey in enemies for x, y in sources):
+            return []
+        field = self.chase_map.update(self.dungeon, sources)
+        movers = sorted((d, y, x) for (x, y), d in field.items() if d > 0 and (x, y) in enemies)
+        attackers = []
+        for dist, y, x in movers:
+            for enemy in list(enemies.get((x, y), ())):
+                if dist == 1:
+                    attackers.append(enemy)
+                    continue
+                for dx, dy in STEPS:
+                    nxt = (x + dx, y + dy)
+                    if field.get(nxt, dist) < dist and nxt not in enemies and nxt not in items:
+                        if self.dungeon.move_enemy(enemy, *nxt):
+                            break
+        return attackers
+
+    def enemy_turn(self):
+        attackers = self.move_enemies()
+        if attackers:
+            self.publish("ambush", [e.name for e in attackers])
+            yield from self.start_combat(attackers)
 
     def move_player(self, player, direction):
         dx, dy = 0, 0
@@ -404,200 +1741,840 @@ class Game:
         new_x, new_y = player.x + dx, player.y + dy
         
         if not (0 <= new_x < self.dungeon.width and 0 <= new_y < self.dungeon.height):
-            self.add_message("You can't move off the map.")
+            self.publish("blocked", True)
             return
 
-        if self.dungeon.grid[new_y][new_x] == UI["stairs"]:
+        tile = self.dungeon.tile(new_x, new_y)
+        if tile == TILE_STAIRS:
             self.dungeon_level += 1
             self.new_level()
             return
 
-        if self.dungeon.grid[new_y][new_x] == UI["floor"]:
-            enemies_in_pos = [e for e in self.dungeon.enemies if e.x == new_x and e.y == new_y]
+        if tile == TILE_FLOOR:
+            enemies_in_pos = list(self.dungeon.enemies_at(new_x, new_y))
             if enemies_in_pos:
-                self.start_combat(enemies_in_pos)
+                yield from self.start_combat(enemies_in_pos)
             else:
-                player.x = new_x
-                player.y = new_y
-                for item in list(self.dungeon.items):
-                    if item.x == new_x and item.y == new_y:
-                        player.inventory.append(item)
-                        self.dungeon.items.remove(item)
-                        self.add_message(f"{player.name} picked up a {item.name}.")
+                self.dungeon.place_player(player, new_x, new_y)
+                for row in list(self.dungeon.items_at(new_x, new_y)):
+                    item = self.dungeon.items[row]
+                    player.inventory.append(item.id)
+                    self.dungeon.remove_item(row, new_x, new_y)
+                    self.publish("pickup", player.name, item.name)
         else:
-            self.add_message("You can't move there.")
+            self.publish("blocked", False)
 
     def show_inventory(self, player):
         self.print_game()
-        print("\n--- Inventory ---")
-        print(f"Weapon: {player.weapon.name if player.weapon else 'None'}")
-        print(f"Armor: {player.armor.name if player.armor else 'None'}")
-        print("\nItems:")
+        self.echo("\n--- Inventory ---")
+        self.echo(f"Weapon: {player.weapon.name if player.weapon else 'None'}")
+        self.echo(f"Armor: {player.armor.name if player.armor else 'None'}")
+        self.echo("\nItems:")
         for i, item in enumerate(player.inventory):
-            print(f"{i+1}. {item.name}")
+            self.echo(f"{i+1}. {ITEMS[item].name}")
         
-        action = input("\n(u)se, (e)quip, or (c)ancel: ").lower()
+        action = (yield Prompt("inventory", "\n(u)se, (e)quip, or (c)ancel: ", player)).lower()
         if action == 'u':
-            self.use_potion(player)
+            yield from self.use_potion(player)
         elif action == 'e':
-            self.equip_item(player)
+            yield from self.equip_item(player)
 
     def use_potion(self, player):
-        potions = [item for item in player.inventory if isinstance(item, Potion)]
+        potions = [item for item in player.inventory if isinstance(ITEMS[item], Potion)]
         if not potions:
-            self.add_message("You have no potions to use.")
+            self.publish("no_potions")
             return
         
         for i, p in enumerate(potions):
-            print(f"{i+1}. {p.name}")
-        choice = input("Choose a potion to use: ")
+            self.echo(f"{i+1}. {ITEMS[p].name}")
+        choice = yield Prompt("potion", "Choose a potion to use: ", player, potions)
         if choice.isdigit() and 0 < int(choice) <= len(potions):
-            potion = potions[int(choice)-1]
-            msg = potion.use(player)
-            self.add_message(msg)
-            player.inventory.remove(potion)
+            potion = ITEMS[potions[int(choice)-1]]
+            potion.use(player)
+            self.publish("potion", player.name, potion.name, potion.hp_gain)
+            player.inventory.remove(potion.id)
         else:
-            self.add_message("Invalid choice.")
+            self.publish("invalid")
 
     def equip_item(self, player):
-        equippable = [item for item in player.inventory if isinstance(item, (Weapon, Armor))]
+        equippable = [item for item in player.inventory if isinstance(ITEMS[item], (Weapon, Armor))]
         if not equippable:
-            self.add_message("You have nothing to equip.")
+            self.publish("nothing_to_equip")
             return
 
         for i, item in enumerate(equippable):
-            print(f"{i+1}. {item.name}")
-        choice = input("Choose an item to equip: ")
+            self.echo(f"{i+1}. {ITEMS[item].name}")
+        choice = yield Prompt("equip", "Choose an item to equip: ", player, equippable)
         if choice.isdigit() and 0 < int(choice) <= len(equippable):
-            item = equippable[int(choice)-1]
+            item = ITEMS[equippable[int(choice)-1]]
             if isinstance(item, Weapon):
                 if player.weapon:
-                    player.inventory.append(player.weapon)
+                    player.inventory.append(player.weapon.id)
                 player.weapon = item
-                player.inventory.remove(item)
-                self.add_message(f"{player.name} equipped {item.name}.")
+                player.inventory.remove(item.id)
+                self.publish("equip", player.name, item.name)
             elif isinstance(item, Armor):
                 if player.armor:
-                    player.inventory.append(player.armor)
+                    player.inventory.append(player.armor.id)
                 player.armor = item
-                player.inventory.remove(item)
-                self.add_message(f"{player.name} equipped {item.name}.")
+                player.inventory.remove(item.id)
+                self.publish("equip", player.name, item.name)
         else:
-            self.add_message("Invalid choice.")
+            self.publish("invalid")
 
     def start_combat(self, enemies):
-        self.add_message("You've entered combat!")
+        self.publish("combat")
         turn_order = self.players + enemies
-        random.shuffle(turn_order)
+        self.rng.shuffle(turn_order)
 
-        while any(p.is_alive() for p in self.players) and any(e.is_alive() for e in enemies):
-            for entity in turn_order:
-                if not entity.is_alive(): continue
+        self.apply_auras(enemies)
+        try:
+            while ENTITIES.any_alive(self.players) and ENTITIES.any_alive(enemies):
+                for entity in turn_order:
+                    if not entity.is_alive(): continue
+                    # Stop mid-round as soon as one side has been wiped out
+                    if not ENTITIES.any_alive(enemies) or not ENTITIES.any_alive(self.players):
+                        break
                 
-                self.print_game()
-                print("\n--- Combat ---")
-                for p in self.players: print(f"{p.name} HP: {p.hp}/{p.max_hp}")
-                for e in enemies: print(f"{e.name} HP: {e.hp}")
-
-                if isinstance(entity, Player):
-                    action = input(f"\n{entity.name}'s turn. (1) Attack, (2) Skill, (3) Inventory: ").lower()
-                    if action == '1':
-                        alive_enemies = [e for e in enemies if e.is_alive()]
-                        if alive_enemies:
-                            target = random.choice(alive_enemies)
+                    self.print_game()
+                    self.echo("\n--- Combat ---")
+                    if self.renderer:
+                        for p in self.players: self.echo(f"{p.name} HP: {p.hp}/{p.max_hp}")
+                        for e in enemies: self.echo(f"{e.name} HP: {e.hp}")
+
+                    if isinstance(entity, Player):
+                        action = (yield Prompt("combat", f"\n{entity.name}'s turn. (1) Attack, (2) Skill, (3) Inventory: ", entity, enemies)).lower()
+                        if action == '1':
+                            alive_enemies = ENTITIES.living(enemies)
+                            if alive_enemies:
+                                target = self.rng.choice(alive_enemies)
+                                damage = max(0, entity.attack - target.defense)
+                                self.deal_damage(entity, target, damage)
+                                self.publish("damage", entity.name, target.name, damage, None)
+                        elif action == '2':
+                            self.use_skill(entity, enemies)
+                        elif action == '3':
+                            yield from self.show_inventory(entity)
+                    else: # Enemy turn
+                        alive_players = ENTITIES.living(self.players)
+                        if alive_players:
+                            target = self.rng.choice(alive_players)
                             damage = max(0, entity.attack - target.defense)
-                            target.take_damage(damage)
-                            self.add_message(f"{entity.name} hits {target.name} for {damage} damage.")
-                    elif action == '2':
-                        self.use_skill(entity, enemies)
-                    elif action == '3':
-                        self.show_inventory(entity)
-                else: # Enemy turn
-                    alive_players = [p for p in self.players if p.is_alive()]
-                    if alive_players:
-                        target = random.choice(alive_players)
-                        damage = max(0, entity.attack - target.defense)
-                        target.take_damage(damage)
-                        self.add_message(f"{entity.name} hits {target.name} for {damage} damage.")
-        
+                            self.deal_damage(entity, target, damage)
+                            self.publish("damage", entity.name, target.name, damage, None)
+        finally:
+            self.remove_auras(enemies)
+
         if any(p.is_alive() for p in self.players):
-            if any(e.name == 'Dragon' for e in enemies):
-                self.add_message("Congratulations! You have defeated the Dragon and won the game!")
+            boss = next((e for e in enemies if e.enemy_type == BOSS_ENEMY), None)
+            if boss is not None:
+                self.publish("victory", boss.name)
                 self.game_over = True
+                self.won = True
             else:
-                self.add_message("You won the battle!")
+                self.publish("battle_won")
             total_xp = sum(e.xp for e in enemies)
             xp_per_player = total_xp // len(self.players) if self.players else 0
             for p in self.players:
                 if p.is_alive():
-                    msg = p.gain_xp(xp_per_player)
-                    if msg: self.add_message(msg)
-            self.dungeon.enemies = [e for e in self.dungeon.enemies if e not in enemies]
+                    if p.gain_xp(xp_per_player):
+                        self.publish("level_up", p.name, p.level)
+            for e in enemies:
+                self.dungeon.remove_enemy(e)
         else:
-            self.add_message("Your party has been defeated. Game Over.")
+            self.publish("defeat")
             self.game_over = True
-            self.update_highscores()
+            if self.renderer:
+                self.update_highscores()
+
+    def apply_auras(self, enemies):
+        # A living hero whose class has an aura lends it to the whole party,
+        # or turns it on the enemies, for as long as the fight lasts
+        for hero in self.players:
+            aura = CLASSES[hero.char_class].get("aura")
+            if aura and hero.is_alive():
+                for target in self.players if aura["target"] == "party" else enemies:
+                    target.add_modifier(Modifier(f"{hero.char_class} aura", aura.get("attack", 0),
+                                                 aura.get("defense", 0)))
+
+    def remove_auras(self, enemies):
+        for entity in self.players + enemies:
+            for char_class in CLASS_NAMES:
+                entity.remove_modifier(f"{char_class} aura")
 
     def use_skill(self, player, enemies):
         if player.char_class == "warrior":
             if player.skill_cooldown > 0:
-                self.add_message(f"Power Strike is on cooldown for {player.skill_cooldown} more turns.")
+                self.publish("cooldown", "Power Strike", player.skill_cooldown)
                 return
-            target = random.choice([e for e in enemies if e.is_alive()])
+            target = self.rng.choice([e for e in enemies if e.is_alive()])
             damage = player.attack * 2
-            target.take_damage(damage)
-            self.add_message(f"{player.name} uses Power Strike on {target.name} for {damage} damage!")
+            self.deal_damage(player, target, damage)
+            self.publish("damage", player.name, target.name, damage, "Power Strike")
             player.skill_cooldown = 3
         elif player.char_class == "mage":
             if player.mana < 10:
-                self.add_message("Not enough mana for Fireball.")
+                self.publish("no_mana", "Fireball")
                 return
-            self.add_message(f"{player.name} casts Fireball!")
+            self.publish("skill", player.name, "Fireball")
             for enemy in enemies:
                 if enemy.is_alive():
                     damage = player.attack // 2
-                    enemy.take_damage(damage)
-                    self.add_message(f"Fireball hits {enemy.name} for {damage} damage.")
+                    self.deal_damage(player, enemy, damage)
+                    self.publish("damage", player.name, enemy.name, damage, "Fireball")
             player.mana -= 10
         elif player.char_class == "archer":
             if player.skill_cooldown > 0:
-                self.add_message(f"Double Shot is on cooldown for {player.skill_cooldown} more turns.")
+                self.publish("cooldown", "Double Shot", player.skill_cooldown)
                 return
-            self.add_message(f"{player.name} uses Double Shot!")
+            self.publish("skill", player.name, "Double Shot")
             for _ in range(2):
-                target = random.choice([e for e in enemies if e.is_alive()])
+                alive_enemies = [e for e in enemies if e.is_alive()]
+                if not alive_enemies:
+                    break
+                target = self.rng.choice(alive_enemies)
                 damage = player.attack
-                target.take_damage(damage)
-                self.add_message(f"{player.name} shoots {target.name} for {damage} damage.")
+                self.deal_damage(player, target, damage)
+                self.publish("damage", player.name, target.name, damage, "Double Shot")
             player.skill_cooldown = 2
 
     def update_highscores(self):
-        scores = []
-        if os.path.exists(HIGHSCORE_FILE):
-            try:
-                with open(HIGHSCORE_FILE, 'r') as f:
-                    scores = json.load(f)
-            except json.JSONDecodeError:
-                scores = []
-        
+        self.show_highscores(self.record_highscore())
+
+    def record_highscore(self):
+        # Touches nothing but the database, so it can run on another thread
         total_xp = sum(p.xp for p in self.players)
         party_names = ", ".join([p.name for p in self.players])
-        scores.append({"party": party_names, "level": self.dungeon_level, "xp": total_xp})
-        
-        scores = sorted(scores, key=lambda x: (x['level'], x['xp']), reverse=True)[:10]
+        store = HighscoreStore(self.highscore_db)
+        try:
+            store.record(party_names, self.dungeon_level, total_xp, self.seed, self.turns, self.won, self.killed_by)
+            return store.top(10)
+        finally:
+            store.close()
 
-        with open(HIGHSCORE_FILE, 'w') as f:
-            json.dump(scores, f, indent=4)
-        
-        print("\n--- Highscores ---")
+    def show_highscores(self, scores):
+        self.echo("\n--- Highscores ---")
         for score in scores:
-            print(f"Party: {score['party']}, Level: {score['level']}, XP: {score['xp']}")
+            self.echo(f"Party: {score['party']}, Level: {score['level']}, XP: {score['xp']}")
+
+# --- Saves ---
+# A save file is a fixed header, the raw tile grid and then a stream of
+# records. The grid sits at an aligned offset and is stored exactly as
+# Dungeon.tiles, so loading maps it instead of parsing it. A snapshot writes
+# every record once; each autosave after that appends only the records that
+# changed since, closed by a commit record so a torn write is ignored.
+SAVE_MAGIC = b"RPGS"
+SAVE_VERSION = 1
+SAVE_ALIGN = 64
+SAVE_COMPACT_BYTES = 1 << 20  # rewrite the snapshot once the deltas grow past this
+
+SAVE_HEADER = struct.Struct("<4sHHQQ")  # magic, version, flags, grid offset, grid size
+RECORD = struct.Struct("<BI")  # kind, payload size
+REC_CONFIG, REC_LEVEL, REC_GAME, REC_RNG, REC_MESSAGES = 1, 2, 3, 4, 5
+REC_PLAYER, REC_ENEMY, REC_ENEMY_GONE, REC_ITEM, REC_ITEM_GONE = 6, 7, 8, 9, 10
+REC_WORLD, REC_COMMIT, REC_WORLD_ENEMY, REC_WORLD_ENEMY_GONE = 11, 12, 13, 14
+
+CONFIG = struct.Struct("<IIIBIB")  # width, height, max rooms, world, chunk budget, enemy ai
+LEVEL = struct.Struct("<iiI")  # stairs x, stairs y, room count
+ROOM = struct.Struct("<iiii")
+GAME = struct.Struct("<QIIB")  # turns, current hero, dungeon level, flags
+PLAYER = struct.Struct("<BB12i")
+ENEMY = struct.Struct("<IiiiB")  # slot, x, y, hp, type
+ITEM_SLOT = struct.Struct("<Iii")  # slot, x, y
+ITEM = struct.Struct("<Bi")  # kind, bonus
+SLOT = struct.Struct("<I")
+COMMIT = struct.Struct("<Q")  # turns
+COUNT = struct.Struct("<I")
+CHUNK_KEY = struct.Struct("<iiI")
+CHUNK_POS = struct.Struct("<ii")
+WORLD_ENEMY = struct.Struct("<IiiIiii")  # slot, chunk x, chunk y, spawn index, x, y, hp
+SPAWN_KEY = struct.Struct("<BI")
+GAUSS = struct.Struct("<Bd")
+
+FLAG_GAME_OVER, FLAG_WON, FLAG_QUIT, FLAG_KILLED = 1, 2, 4, 8
+ITEM_TYPES = (Potion, Weapon, Armor)
+ITEM_BONUS = ("hp_gain", "attack_bonus", "defense_bonus")
+ITEM_NONE = 255
+
+def pack_str(text):
+    data = (text or "").encode()
+    return struct.pack("<H", len(data)) + data
+
+def pack_item(item):
+    if item is None:
+        return ITEM.pack(ITEM_NONE, 0)
+    kind = ITEM_TYPES.index(type(item))
+    return ITEM.pack(kind, getattr(item, ITEM_BONUS[kind])) + pack_str(item.name)
+
+class SaveReader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.pos)
+        self.pos += layout.size
+        return values
+
+    def string(self):
+        (size,) = struct.unpack_from("<H", self.data, self.pos)
+        self.pos += 2 + size
+        return bytes(self.data[self.pos - size:self.pos]).decode()
+
+    def item(self):
+        kind, bonus = self.unpack(ITEM)
+        if kind == ITEM_NONE:
+            return None
+        return item_template(ITEM_TYPES[kind], self.string(), bonus)
+
+class SaveFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.dungeon = None
+        self.written = {}  # (kind, slot) -> payload last written
+        self.slots = {}  # id(entity) -> slot, for enemies; floor items use their table row
+        self.entities = []  # keeps the ids in self.slots from being reused
+        self.spawns = {}  # (chunk x, chunk y, spawn index) -> slot, for enemies of world chunks
+        self.next_slot = 0
+        self.journal_bytes = 0
+
+    def slot(self, entity, slot=None):
+        if slot is None:
+            slot = self.slots.get(id(entity))
+            if slot is not None:
+                return slot
+            slot = self.next_slot
+        self.slots[id(entity)] = slot
+        self.entities.append(entity)
+        self.next_slot = max(self.next_slot, slot + 1)
+        return slot
+
+    def records(self, game):
+        # Every record for the current state, keyed by what it describes
+        d = self.dungeon
+        width, height, max_rooms = game.map_size
+        chunk_budget, spill_dir = game.world or (0, None)
+        # The panel is saved as text; events already shown are not formatted again
+        messages = game.events.messages()
+        records = {
+            (REC_CONFIG, 0): pack_str(str(game.seed)) + pack_str(spill_dir) + CONFIG.pack(
+                width, height, max_rooms, bool(game.world), chunk_budget, game.chase_map is not None),
+            (REC_MESSAGES, 0): COUNT.pack(len(messages)) + b"".join(pack_str(m) for m in messages),
+        }
+        flags = ((FLAG_GAME_OVER if game.game_over else 0) | (FLAG_WON if game.won else 0)
+                 | (FLAG_QUIT if game.quit else 0) | (FLAG_KILLED if game.killed_by is not None else 0))
+        records[(REC_GAME, 0)] = GAME.pack(game.turns, game.current_player_idx, game.dungeon_level,
+                                           flags) + pack_str(game.killed_by)
+        _, internal, gauss = game.rng.getstate()
+        records[(REC_RNG, 0)] = (array.array("I", internal).tobytes()
+                                 + GAUSS.pack(gauss is not None, gauss or 0.0))
+        for slot, p in enumerate(game.players):
+            records[(REC_PLAYER, slot)] = (
+                PLAYER.pack(slot, ENTITIES.kind[p.id], p.x, p.y, p.hp, p.max_hp,
+                            p.base_attack, p.base_defense, p.xp, p.total_xp, p.level, p.mana,
+                            p.max_mana, p.skill_cooldown)
+                + pack_str(p.name) + pack_item(p.weapon) + pack_item(p.armor)
+                + COUNT.pack(len(p.inventory)) + b"".join(pack_item(ITEMS[i]) for i in p.inventory))
+        xs, ys, hps, kinds = ENTITIES.x, ENTITIES.y, ENTITIES.hp, ENTITIES.kind
+        if isinstance(d, ChunkedDungeon):
+            # Chunks are rebuilt from their seeds, so what is saved is the
+            # spawns removed, which chunks are loaded in eviction order, and
+            # where the enemies of the loaded chunks are and how hurt
+            removed = dict(d.evicted)
+            removed.update((key, chunk.removed) for key, chunk in d.chunks.items() if chunk.removed)
+            parts = [COUNT.pack(len(removed))]
+            for (cx, cy), keys in sorted(removed.items()):
+                parts.append(CHUNK_KEY.pack(cx, cy, len(keys)))
+                parts.extend(SPAWN_KEY.pack(kind == "item", i) for kind, i in sorted(keys))
+            parts.append(COUNT.pack(len(d.chunks)))
+            parts.extend(CHUNK_POS.pack(cx, cy) for cx, cy in d.chunks)
+            records[(REC_WORLD, 0)] = b"".join(parts)
+            spawns = {}
+            for (cx, cy), chunk in d.chunks.items():
+                for e in chunk.enemies:
+                    key, row = (cx, cy, e.spawn_id[1]), e.id
+                    slot = self.spawns.get(key)
+                    if slot is None:
+                        slot, self.next_slot = self.next_slot, self.next_slot + 1
+                    spawns[key] = slot
+                    records[(REC_WORLD_ENEMY, slot)] = WORLD_ENEMY.pack(slot, *key, xs[row], ys[row], hps[row])
+            # Spawns killed or unloaded since are written as gone
+            self.spawns = spawns
+            return records
+        stairs = d.stairs_down or (-1, -1)
+        records[(REC_LEVEL, 0)] = LEVEL.pack(*stairs, len(d.rooms)) + b"".join(
+            ROOM.pack(r.x1, r.y1, r.x2 - r.x1, r.y2 - r.y1) for r in d.rooms)
+        # Enemy state is read straight from the entity columns
+        for e in d.enemies:
+            slot, row = self.slot(e), e.id
+            records[(REC_ENEMY, slot)] = ENEMY.pack(slot, xs[row], ys[row], hps[row], kinds[row])
+        items = d.items
+        for row in items:
+            # Items never change while they lie on the floor
+            payload = self.written.get((REC_ITEM, row))
+            records[(REC_ITEM, row)] = payload or ITEM_SLOT.pack(row, items.x[row], items.y[row]) + pack_item(items[row])
+        return records
+
+    def encode(self, records, turns):
+        out = []
+        for (kind, slot), payload in records.items():
+            if self.written.get((kind, slot)) != payload:
+                out.append(RECORD.pack(kind, len(payload)))
+                out.append(payload)
+                self.written[(kind, slot)] = payload
+        # Enemies killed and items picked up since the last save
+        for kind, slot in [key for key in self.written if key not in records]:
+            del self.written[(kind, slot)]
+            out.append(RECORD.pack(kind + 1, SLOT.size))
+            out.append(SLOT.pack(slot))
+        out.append(RECORD.pack(REC_COMMIT, COMMIT.size))
+        out.append(COMMIT.pack(turns))
+        return b"".join(out)
+
+    def snapshot(self, game):
+        self.close()
+        self.dungeon = d = game.dungeon
+        self.written, self.slots, self.entities, self.spawns, self.next_slot = {}, {}, [], {}, 0
+        grid = b""
+        if isinstance(d, Dungeon):
+            if isinstance(d.tiles, memoryview):
+                # Let go of the mapping of the file about to be replaced
+                d.tiles = bytearray(d.tiles)
+            grid = d.tiles
+        records = self.records(game)
+        offset = -(-SAVE_HEADER.size // SAVE_ALIGN) * SAVE_ALIGN
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, 0, offset, len(grid)).ljust(offset, b"\0"))
+            f.write(grid)
+            f.write(self.encode(records, game.turns))
+        os.replace(tmp, self.path)
+        self.journal_bytes = 0
+
+    def autosave(self, game):
+        if game.dungeon is not self.dungeon or self.journal_bytes > SAVE_COMPACT_BYTES:
+            self.snapshot(game)
+            return
+        delta = self.encode(self.records(game), game.turns)
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        # Flushed but not fsynced, so a save costs a write() and not a disk flush
+        self.file.write(delta)
+        self.file.flush()
+        self.journal_bytes += len(delta)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def read_save(path):
+    # Returns the mapped grid, the latest committed payload per record and
+    # the number of record bytes, which grows with every autosave
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    view = memoryview(mapped)
+    magic, version, _, offset, size = SAVE_HEADER.unpack_from(view)
+    if magic != SAVE_MAGIC or version != SAVE_VERSION:
+        raise ValueError(f"{path} is not a save file this version can read")
+    grid = view[offset:offset + size]
+    state, pending = {}, []
+    pos, end = offset + size, len(view)
+    while pos + RECORD.size <= end:
+        kind, length = RECORD.unpack_from(view, pos)
+        pos += RECORD.size
+        if pos + length > end:
+            break
+        payload = view[pos:pos + length]
+        pos += length
+        if kind == REC_COMMIT:
+            for key, value in pending:
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+            pending = []
+        elif kind in (REC_ENEMY_GONE, REC_ITEM_GONE, REC_WORLD_ENEMY_GONE):
+            pending.append(((kind - 1, SLOT.unpack(payload)[0]), None))
+        elif kind in (REC_PLAYER, REC_ENEMY, REC_ITEM, REC_WORLD_ENEMY):
+            pending.append(((kind, SLOT.unpack_from(payload)[0] if kind != REC_PLAYER else payload[0]), payload))
+        else:
+            pending.append(((kind, 0), payload))
+    return grid, state, end - offset - size
+
+def load_game(path, headless=False, pregenerate=None):
+    grid, state, journal_bytes = read_save(path)
+    config = SaveReader(state[(REC_CONFIG, 0)])
+    seed, spill_dir = int(config.string()), config.string() or None
+    width, height, max_rooms, world, chunk_budget, enemy_ai = config.unpack(CONFIG)
+    game = Game(headless=headless, seed=seed, pregenerate=pregenerate, width=width, height=height,
+                max_rooms=max_rooms, world=bool(world), chunk_budget=chunk_budget, spill_dir=spill_dir,
+                enemy_ai=bool(enemy_ai), save_path=path)
+
+    reader = SaveReader(state[(REC_GAME, 0)])
+    game.turns, game.current_player_idx, game.dungeon_level, flags = reader.unpack(GAME)
+    killed_by = reader.string()
+    game.game_over, game.won, game.quit = bool(flags & FLAG_GAME_OVER), bool(flags & FLAG_WON), bool(flags & FLAG_QUIT)
+    game.killed_by = killed_by if flags & FLAG_KILLED else None
+    rng = state[(REC_RNG, 0)]
+    has_gauss, gauss = GAUSS.unpack_from(rng, len(rng) - GAUSS.size)
+    internal = tuple(array.array("I", bytes(rng[:len(rng) - GAUSS.size])))
+    game.rng.setstate((3, internal, gauss if has_gauss else None))
+    reader = SaveReader(state[(REC_MESSAGES, 0)])
+    for _ in range(reader.unpack(COUNT)[0]):
+        game.publish("text", reader.string())
+
+    level = game.dungeon_level
+    loaded = []
+    if world:
+        d = ChunkedDungeon(level, game.level_seed(level), chunk_budget, spill_dir)
+        reader = SaveReader(state[(REC_WORLD, 0)])
+        for _ in range(reader.unpack(COUNT)[0]):
+            cx, cy, count = reader.unpack(CHUNK_KEY)
+            keys = (reader.unpack(SPAWN_KEY) for _ in range(count))
+            d.evicted[(cx, cy)] = {("item" if is_item else "enemy", i) for is_item, i in keys}
+        # Saves from before loaded chunks were recorded end here
+        if reader.pos < len(reader.data):
+            loaded = [reader.unpack(CHUNK_POS) for _ in range(reader.unpack(COUNT)[0])]
+    else:
+        d = Dungeon(width, height, level, game.level_seed(level), max_rooms)
+        d.tiles = grid
+        reader = SaveReader(state[(REC_LEVEL, 0)])
+        stairs_x, stairs_y, rooms = reader.unpack(LEVEL)
+        d.stairs_down = (stairs_x, stairs_y) if stairs_x >= 0 else None
+        for _ in range(rooms):
+            room = Rect(*reader.unpack(ROOM))
+            d.rooms.append(room)
+            d.room_grid.add(room)
+    game.dungeon = d
+    saver = game.save_file
+    saver.dungeon = d
+
+    for key in sorted(state):
+        reader = SaveReader(state[key])
+        if key[0] == REC_PLAYER:
+            _, char_class, x, y, *stats = reader.unpack(PLAYER)
+            p = Player(x, y, reader.string(), CLASS_NAMES[char_class])
+            (p.hp, p.max_hp, p.base_attack, p.base_defense, p.xp, p.total_xp, p.level,
+             p.mana, p.max_mana, p.skill_cooldown) = stats
+            p.weapon, p.armor = reader.item(), reader.item()
+            p.inventory = [reader.item().id for _ in range(reader.unpack(COUNT)[0])]
+            game.players.append(p)
+            d.place_player(p, x, y)
+        elif key[0] == REC_ENEMY:
+            slot, x, y, hp, enemy_type = reader.unpack(ENEMY)
+            enemy = Enemy(x, y, ENEMY_TYPES[enemy_type])
+            enemy.hp = hp
+            d.add_enemy(enemy)
+            saver.slot(enemy, slot)
+        elif key[0] == REC_ITEM:
+            slot, x, y = reader.unpack(ITEM_SLOT)
+            d.add_item(reader.item().id, x, y, slot)
+
+    if world:
+        # The heroes' chunks are loaded by now; the rest follow in the order
+        # they were last used, so later evictions pick the same chunks
+        for cx, cy in loaded:
+            d.chunk(cx, cy)
+        for key in sorted(k for k in state if k[0] == REC_WORLD_ENEMY):
+            slot, cx, cy, spawn, x, y, hp = WORLD_ENEMY.unpack(state[key])
+            chunk = d.chunks.get((cx, cy))
+            enemy = next((e for e in chunk.enemies if e.spawn_id == ("enemy", spawn)), None) if chunk else None
+            if enemy is None:
+                continue
+            d.enemy_index.move(enemy, x, y)
+            enemy.hp = hp
+            saver.spawns[(cx, cy, spawn)] = slot
+            saver.next_slot = max(saver.next_slot, slot + 1)
+
+    # Carry on appending to the same file, starting from what it already holds
+    saver.written = {key: bytes(value) for key, value in state.items()}
+    saver.journal_bytes = journal_bytes
+    return game
+
+# --- Input Logs ---
+REPLAY_FILE = "rpg_replays.jsonl"  # where --replay-log appends new runs by default
+# One letter per prompt kind, so a log can tell where a replay stops matching
+PROMPT_CODES = {"party_size": "p", "hero_name": "n", "hero_class": "c", "turn": "t", "combat": "f",
+                "inventory": "i", "potion": "u", "equip": "e"}
+
+def game_config(game):
+    width, height, max_rooms = game.map_size
+    chunk_budget = game.world[0] if game.world else MAX_LOADED_CHUNKS
+    return {"width": width, "height": height, "max_rooms": max_rooms, "world": bool(game.world),
+            "chunk_budget": chunk_budget, "enemy_ai": game.chase_map is not None}
+
+def run_result(game):
+    # What a replay has to reproduce for the run to count as verified
+    return {
+        "turns": game.turns,
+        "level": game.dungeon_level,
+        "won": game.won,
+        "quit": game.quit,
+        "killed_by": game.killed_by,
+        "party": [[p.char_class, p.level, p.hp, p.total_xp] for p in game.players],
+    }
+
+class InputLog:
+    # A run is its seed and map settings plus every answer given, in order.
+    # Everything else follows from those, so the log is all a replay needs.
+    def __init__(self, seed, config, kinds="", answers=None, result=None):
+        self.seed = seed
+        self.config = config
+        self.kinds = list(kinds)  # the PROMPT_CODES letter of each answer's prompt
+        self.answers = answers if answers is not None else []
+        self.result = result
+
+    @classmethod
+    def for_game(cls, game):
+        return cls(game.seed, game_config(game))
+
+    @classmethod
+    def from_json(cls, line):
+        data = json.loads(line)
+        return cls(data["seed"], data["config"], data["kinds"], data["answers"], data.get("result"))
+
+    def to_json(self):
+        return json.dumps({"seed": self.seed, "config": self.config, "kinds": "".join(self.kinds),
+                           "answers": self.answers, "result": self.result})
+
+    def digest(self):
+        return hashlib.sha256(self.to_json().encode()).hexdigest()[:16]
+
+    def record(self, session):
+        # Passes the prompts of a play() generator through, keeping the answers
+        answer = None
+        try:
+            while True:
+                prompt = session.send(answer)
+                answer = yield prompt
+                self.kinds.append(PROMPT_CODES[prompt.kind])
+                self.answers.append(answer)
+        except StopIteration:
+            pass
+        finally:
+            session.close()
+
+    def finish(self, game, path=REPLAY_FILE):
+        self.result = run_result(game)
+        with open(path, "a") as f:
+            f.write(self.to_json() + "\n")
+
+def read_logs(path):
+    with open(path) as f:
+        return [InputLog.from_json(line) for line in f if line.strip()]
+
+# --- Profiling ---
+PROFILE_FILE = "rpg_profile.json"
+PROFILE_TOP = 25  # functions and allocation sites listed in the report
+
+class Timer:
+    # Call count, total and a histogram with one bucket per power of two
+    # nanoseconds, which is enough for percentiles within a factor of two
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * 64
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        self.buckets[ns.bit_length()] += 1
+
+    def percentile(self, q):
+        seen, rank = 0, q * self.count
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(1 << bucket, self.max)
+        return self.max
+
+    def report(self):
+        ms = lambda ns: round(ns / 1e6, 4)
+        return {
+            "calls": self.count,
+            "total_ms": ms(self.total),
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(0.5)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max),
+            # Upper bound of each bucket in microseconds, and its calls
+            "histogram_us": [[round((1 << b) / 1e3, 3), n] for b, n in enumerate(self.buckets) if n],
+        }
+
+def timed(func, timer):
+    perf_ns = time.perf_counter_ns
+    if not inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add(perf_ns() - start)
+        return wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Only the time spent running counts, not the time waiting at prompts
+        gen = func(*args, **kwargs)
+        elapsed, answer = 0, None
+        try:
+            while True:
+                start = perf_ns()
+                try:
+                    prompt = gen.send(answer)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    elapsed += perf_ns() - start
+                answer = yield prompt
+        finally:
+            gen.close()
+            timer.add(elapsed)
+    return wrapper
+
+# Times are inclusive: move_player contains any fight it starts, and
+# start_combat the print_game calls of every combat turn
+PROFILE_TARGETS = [
+    (Dungeon, "generate"), (ChunkedDungeon, "generate"), (Game, "print_game"), (Game, "move_player"),
+    (Game, "move_enemies"), (Game, "start_combat"), (Game, "update_highscores"), (SaveFile, "autosave"),
+]
+
+class Profiler:
+    # Wraps the hot paths only while installed, so a normal run calls the
+    # plain methods and pays nothing for the instrumentation
+    def __init__(self, path=PROFILE_FILE, cpu=False, memory=False, targets=PROFILE_TARGETS):
+        self.path = path
+        self.targets = targets
+        self.timers = {}
+        self.originals = []
+        self.cpu = cProfile.Profile() if cpu else None
+        self.memory = memory
+        self.started = None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        self.write()
+
+    def install(self):
+        for cls, name in self.targets:
+            original = cls.__dict__[name]
+            timer = self.timers[f"{cls.__name__}.{name}"] = Timer()
+            self.originals.append((cls, name, original))
+            setattr(cls, name, timed(original, timer))
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            self.cpu.enable()
+        self.started = time.perf_counter()
+
+    def uninstall(self):
+        if self.cpu:
+            self.cpu.disable()
+        for cls, name, original in reversed(self.originals):
+            setattr(cls, name, original)
+        self.originals = []
+
+    def report(self):
+        report = {
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "timers": {name: timer.report() for name, timer in self.timers.items() if timer.count},
+        }
+        if self.cpu:
+            stats = pstats.Stats(self.cpu)
+            rows = sorted(stats.stats.items(), key=lambda row: row[1][3], reverse=True)[:PROFILE_TOP]
+            report["cpu"] = [{"function": f"{path}:{line}({name})", "calls": calls,
+                              "self_ms": round(self_time * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3)}
+                             for (path, line, name), (_, calls, self_time, cumulative, _) in rows]
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+            tracemalloc.stop()
+            report["memory"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top": [{"site": str(stat.traceback[0]), "bytes": stat.size, "blocks": stat.count} for stat in top],
+            }
+        return report
+
+    def write(self):
+        with open(self.path, "w") as f:
+            json.dump(self.report(), f, indent=4)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emoji dungeon crawler.")
+    parser.add_argument("--seed", type=int, help="replay the dungeon of an earlier run")
+    parser.add_argument("--width", type=int, default=MAP_WIDTH, help="map width in tiles")
+    parser.add_argument("--height", type=int, default=MAP_HEIGHT, help="map height in tiles")
+    parser.add_argument("--rooms", type=int, default=MAX_ROOMS, help="room placement attempts per level")
+    parser.add_argument("--world", action="store_true", help="endless levels streamed in chunks")
+    parser.add_argument("--chunk-budget", type=int, default=MAX_LOADED_CHUNKS, help="chunks kept in memory")
+    parser.add_argument("--spill-dir", help="write the state of evicted chunks here")
+    parser.add_argument("--save", help="autosave the run to this file every turn")
+    parser.add_argument("--load", help="resume the run saved in this file")
+    parser.add_argument("--events", help="append every game event to this file as JSON lines")
+    parser.add_argument("--replay-log", nargs="?", const=REPLAY_FILE, metavar="FILE",
+                        help=f"append the seed and every answer of new runs here, for rpg_replay.py (default {REPLAY_FILE})")
+    parser.add_argument("--realtime", action="store_true", help="play with single keys instead of Enter")
+    parser.add_argument("--fps", type=int, default=TARGET_FPS, help="redraw rate with --realtime")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_FILE, metavar="REPORT",
+                        help=f"time the hot paths and write a JSON report on exit (default {PROFILE_FILE})")
+    parser.add_argument("--profile-cpu", action="store_true", help="add a cProfile summary to the report")
+    parser.add_argument("--profile-memory", action="store_true", help="add tracemalloc allocation sites to the report")
+    args = parser.parse_args()
+    if min(args.width, args.height) < ROOM_MAX_SIZE + 2:
+        parser.error(f"--width and --height must be at least {ROOM_MAX_SIZE + 2}")
+    profiler = None
+    if args.profile or args.profile_cpu or args.profile_memory:
+        profiler = Profiler(args.profile or PROFILE_FILE, cpu=args.profile_cpu, memory=args.profile_memory)
+        profiler.install()
     # For Windows, set console to utf-8
     if os.name == 'nt':
         os.system('chcp 65001')
         os.system('cls')
-    game = Game()
-    game.setup_game()
-    game.main_loop()
+    realtime = args.realtime and termios is not None and sys.stdin.isatty()
+    if args.realtime and not realtime:
+        print("--realtime needs a Unix terminal, falling back to line input.")
+    input_log = None
+    if args.load:
+        game = load_game(args.load)
+        session = game.resume()
+    else:
+        game = Game(seed=args.seed, width=args.width, height=args.height, max_rooms=args.rooms,
+                    world=args.world, chunk_budget=args.chunk_budget, spill_dir=args.spill_dir,
+                    save_path=args.save)
+        session = game.play()
+        if args.replay_log:
+            input_log = InputLog.for_game(game)
+            session = input_log.record(session)
+    if args.events:
+        game.events.subscribe(EventSink(args.events))
+    try:
+        if realtime:
+            game.run_realtime(args.fps, session)
+        else:
+            game.run(session=session)
+    finally:
+        if input_log and input_log.answers:
+            input_log.finish(game, args.replay_log)
+        if profiler:
+            profiler.uninstall()
+            profiler.write()
+            print(f"Profile written to {profiler.path}")
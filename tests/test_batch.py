@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from rpg_batch import BatchCombat, verify
+from rpg_terminal import CLASSES, Enemy, Player
+
+@pytest.mark.parametrize("seed", range(10))
+def test_batch_matches_scalar_combat(seed):
+    assert verify(encounters=300, seed=seed) == 0
+
+def test_party_with_aura_is_refused(monkeypatch):
+    monkeypatch.setitem(CLASSES, "warrior", {**CLASSES["warrior"], "aura": {"target": "party", "defense": 2}})
+    with pytest.raises(ValueError, match="warrior aura"):
+        BatchCombat([([Player(0, 0, "Hero 1", "warrior")], [Enemy(0, 0, "orc")])])
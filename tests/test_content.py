@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from rpg_terminal import CONTENT_DIR, STARTING_WEAPONS, Armor, ContentError, Weapon, compile_content, item_template
+
+BASE = os.path.join(CONTENT_DIR, "base.json")
+
+def compile_with(tmp_path, pack):
+    path = tmp_path / "mod.json"
+    path.write_text(json.dumps(pack), encoding="utf-8")
+    return compile_content([BASE, str(path)])
+
+def warrior(**fields):
+    return {"classes": {"warrior": {"hp": 100, "attack": 15, "defense": 10, "weapon": "Sword",
+                                    "mana": 0, **fields}}}
+
+@pytest.mark.parametrize("aura", [
+    {"attack": 2},
+    {"target": "allies", "attack": 2},
+    {"target": "party", "attack": "2"},
+    {"target": "party", "speed": 1},
+    ["party", 2],
+], ids=["no-target", "bad-target", "bad-amount", "unknown-stat", "not-an-object"])
+def test_bad_aura_is_rejected(tmp_path, aura):
+    with pytest.raises(ContentError, match="warrior.aura"):
+        compile_with(tmp_path, warrior(aura=aura))
+
+def test_aura_and_renamed_boss_load(tmp_path):
+    pack = warrior(aura={"target": "enemies", "attack": -3})
+    pack["enemies"] = {"dragon": {"hp": 250, "attack": 25, "defense": 15, "xp": 1000},
+                       "lich": {"hp": 220, "attack": 28, "defense": 12, "xp": 600, "icon": "L", "boss": True}}
+    content = compile_with(tmp_path, pack)
+    assert content["classes"]["warrior"]["aura"] == {"target": "enemies", "attack": -3}
+    assert [name for name, entry in content["enemies"].items() if entry.get("boss")] == ["lich"]
+
+@pytest.mark.parametrize("section, entry", [
+    ("armor", {"name": "Bow", "defense": 2}),
+    ("weapons", {"name": "Sword", "attack": 1}),
+    ("weapons", {"name": "Health Potion", "attack": 1}),
+], ids=["armor-named-like-a-starting-weapon", "weapon-named-like-a-starting-weapon", "potion-name"])
+def test_reserved_item_name_is_rejected(tmp_path, section, entry):
+    with pytest.raises(ContentError, match=entry["name"]):
+        compile_with(tmp_path, {section: [entry]})
+
+def test_templates_are_told_apart_by_type():
+    # As for a save made with content that had an armor called Bow
+    bow = STARTING_WEAPONS["archer"]
+    saved = item_template(Armor, bow.name, 4)
+    assert isinstance(saved, Armor) and saved.defense_bonus == 4
+    assert item_template(Weapon, bow.name, 5) is bow
@@ -0,0 +1,14 @@
+import gc
+
+import pytest
+
+from rpg_terminal import ENTITIES, Player
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_failed_init_releases_nothing():
+    # Entity.__del__ still runs for the half-built hero
+    free = list(ENTITIES.free)
+    with pytest.raises(KeyError):
+        Player(0, 0, "Hero 1", "no such class")
+    gc.collect()
+    assert ENTITIES.free == free
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from rpg_sim import RandomPolicy
+from rpg_terminal import ENTITIES, ChunkedDungeon, Game, load_game
+
+TURNS = 60
+
+def drive(game, session, policy, turns, prompt=None):
+    # Answers prompts until the start of the given turn; returns the prompt
+    # waiting there, or None if the run ended first
+    try:
+        prompt = session.send(None) if prompt is None else prompt
+        while not (prompt.kind == "turn" and game.turns >= turns):
+            prompt = session.send(policy.decide(game, prompt))
+        return prompt
+    except StopIteration:
+        return None
+
+def state(game):
+    d = game.dungeon
+    players = [(p.name, p.char_class, p.x, p.y, p.hp, p.max_hp, p.xp, p.level, p.mana,
+                p.skill_cooldown, p.weapon and p.weapon.name, p.armor and p.armor.name, list(p.inventory))
+               for p in game.players]
+    common = (game.turns, game.dungeon_level, game.current_player_idx, game.rng.getstate(), players)
+    if isinstance(d, ChunkedDungeon):
+        chunks = [(key, sorted((e.spawn_id, ENTITIES.x[e.id], ENTITIES.y[e.id], e.hp) for e in chunk.enemies),
+                   sorted(chunk.items.values()), sorted(chunk.removed))
+                  for key, chunk in d.chunks.items()]
+        return common + (chunks, {key: sorted(keys) for key, keys in d.evicted.items()})
+    enemies = sorted((e.x, e.y, e.hp, e.name) for e in d.enemies)
+    items = sorted((d.items.x[row], d.items.y[row], d.items[row].name) for row in d.items)
+    return common + (bytes(d.tiles), d.stairs_down, enemies, items)
+
+@pytest.mark.parametrize("world", [False, True], ids=["flat", "world"])
+@pytest.mark.parametrize("seed", range(15))
+def test_save_roundtrip(tmp_path, seed, world):
+    path = str(tmp_path / "run.sav")
+    kwargs = {"world": True, "chunk_budget": 12} if world else {}
+    game = Game(headless=True, seed=seed, pregenerate=False, save_path=path, **kwargs)
+    session = game.play()
+    prompt = drive(game, session, RandomPolicy(rng=random.Random(seed)), TURNS)
+    if prompt is None:
+        pytest.skip("the run ended before the save point")
+    # The autosave at the start of this turn is what gets loaded
+    game.save_file.close()
+    game.save_file = None
+    loaded = load_game(path, headless=True, pregenerate=False)
+    assert state(loaded) == state(game)
+
+    # Both carry on identically from there, and the loaded game keeps saving
+    resumed = loaded.resume()
+    drive(game, session, RandomPolicy(rng=random.Random(seed + 1)), 2 * TURNS, prompt)
+    drive(loaded, resumed, RandomPolicy(rng=random.Random(seed + 1)), 2 * TURNS)
+    assert state(loaded) == state(game)
+    loaded.save_file.close()
+    assert state(load_game(path, headless=True, pregenerate=False)) == state(game)
@@ -0,0 +1,29 @@
+import pytest
+
+from rpg_terminal import (
+    BOSS_ENEMY, GOAL_RANGE, MAX_DUNGEON_LEVEL, TILE_STAIRS, WORLD_CHUNKS, ChunkedDungeon
+)
+
+def load_goal_area(level, seed):
+    # Every chunk the stairs or boss may be in, plus a ring around them
+    origin = WORLD_CHUNKS // 2
+    reach = range(origin - GOAL_RANGE - 1, origin + GOAL_RANGE + 2)
+    world = ChunkedDungeon(level, seed, max_chunks=len(reach) ** 2)
+    for cx in reach:
+        for cy in reach:
+            world.chunk(cx, cy)
+    return world
+
+@pytest.mark.parametrize("seed", range(5))
+def test_one_stairs_per_world_level(seed):
+    world = load_goal_area(1, seed)
+    stairs = [key for key, chunk in world.chunks.items() if TILE_STAIRS in chunk.tiles]
+    assert stairs == [world.goal_chunk]
+    assert world.stairs_down is not None
+    assert not any(e.enemy_type == BOSS_ENEMY for e in world.enemies)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_one_boss_on_the_last_world_level(seed):
+    world = load_goal_area(MAX_DUNGEON_LEVEL, seed)
+    assert [e.enemy_type for e in world.enemies].count(BOSS_ENEMY) == 1
+    assert not any(TILE_STAIRS in chunk.tiles for chunk in world.chunks.values())